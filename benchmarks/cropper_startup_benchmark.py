@@ -0,0 +1,134 @@
+"""Cropper Startup Benchmark
+
+Measures the time from a Cropper job to the first paint of its window, for a cold start
+(new process: imports, `QApplication`, building the window) and for a warm start (hidden window built
+in advance, as the Cropper process does with `data.cropper_warm_start`).
+
+Every mode runs in a fresh process, so imports and Qt state of one run do not leak into the next one.
+
+Main parts:
+------------
+- wait_for_paint(): runs the Qt event loop until a widget has painted.
+- run_cold(): imports, Qt start and one window, timed stage by stage.
+- run_warm(): jobs loaded into one reused window, timed per job.
+
+Usage:
+    python -m benchmarks.cropper_startup_benchmark
+    python -m benchmarks.cropper_startup_benchmark --long-side 8000 --repeat 10
+
+Notes:
+- The photo is the synthetic source of `photo_processing_benchmark` (24 MP by default), its pyramid
+  is built inside the timed part, as it is for a real job.
+- Needs a display (or `QT_QPA_PLATFORM=offscreen`).
+"""
+
+import argparse
+import multiprocessing
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from benchmarks.photo_processing_benchmark import synthetic_source, SOURCE_LONG_SIDE
+
+
+def wait_for_paint(widget, timeout_ms=10000):
+    """Runs the event loop until `widget` has painted once (or `timeout_ms` passed)."""
+    from PyQt5.QtCore import QEvent, QEventLoop, QObject, QTimer
+
+    loop = QEventLoop()
+
+    class PaintFilter(QObject):
+        def eventFilter(self, obj, event):
+            if event.type() == QEvent.Paint:
+                QTimer.singleShot(0, loop.quit)  # After the paint event is handled
+            return False
+
+    paint_filter = PaintFilter()
+    widget.installEventFilter(paint_filter)
+    QTimer.singleShot(timeout_ms, loop.quit)
+    loop.exec_()
+    widget.removeEventFilter(paint_filter)
+
+
+def run_cold(long_side):
+    """One cold start. Runs in a fresh worker process."""
+    image = synthetic_source(30, 40, long_side)
+
+    start = time.perf_counter()
+    from PyQt5.QtWidgets import QApplication
+    from cropper.cropper_main import open_cropper_window
+    imported = time.perf_counter()
+
+    app = QApplication(sys.argv)
+    app_started = time.perf_counter()
+
+    window = open_cropper_window(image=image, number='1234', width=30, height=40)
+    opened = time.perf_counter()
+    wait_for_paint(window.ui.graphicsView_main.viewport())
+    painted = time.perf_counter()
+
+    window.hide()
+    return {
+        'import_s': imported - start,
+        'qapplication_s': app_started - imported,
+        'open_s': opened - app_started,
+        'first_paint_s': painted - start,
+    }
+
+
+def run_warm(long_side, repeat):
+    """Jobs loaded into one hidden warm window. Runs in a fresh worker process."""
+    image = synthetic_source(30, 40, long_side)
+
+    from PyQt5.QtWidgets import QApplication
+    from cropper.cropper_main import SendyCropper, open_cropper_window
+
+    app = QApplication(sys.argv)
+    window = SendyCropper()
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        open_cropper_window(image=image, number='1234', width=30, height=40, window=window)
+        wait_for_paint(window.ui.graphicsView_main.viewport())
+        timings.append(time.perf_counter() - start)
+
+        window.hide()
+        window.reset()
+    return {
+        'first_paint_s': statistics.median(timings),
+        'min_s': min(timings),
+        'max_s': max(timings),
+    }
+
+
+def run(function, *args):
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+        return pool.submit(function, *args).result()
+
+
+def print_result(name, result):
+    stages = '  '.join(f'{stage} {seconds:6.3f}s' for stage, seconds in result.items())
+    print(f'{name:>5}  {stages}')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmarks time to first paint of the Cropper, cold and warm.')
+    parser.add_argument('--long-side', type=int, default=SOURCE_LONG_SIDE, help='long side of the photo in px')
+    parser.add_argument('--repeat', type=int, default=5, help='warm jobs to run, the median is reported')
+    args = parser.parse_args(argv)
+
+    print(f'Cropper startup benchmark: {args.long_side} px photo')
+    cold = run(run_cold, args.long_side)
+    print_result('cold', cold)
+    warm = run(run_warm, args.long_side, args.repeat)
+    print_result('warm', warm)
+    print(f"Warm start is {cold['first_paint_s'] / warm['first_paint_s']:.1f}x faster to first paint")
+    return 0
+
+
+if __name__ == '__main__':
+    multiprocessing.freeze_support()
+    sys.exit(main())
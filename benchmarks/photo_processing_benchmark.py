@@ -0,0 +1,185 @@
+"""Photo Processing Benchmark
+
+Measures `PhotoProc.process_image()` on synthetic sources for every print size of the Cropper size grid
+at the configured DPI, and compares the results with a stored baseline to catch regressions before an update ships.
+
+Every size is rendered in a fresh process, so the peak RSS of one render does not leak into the next one.
+
+Main parts:
+------------
+- SIZES: print sizes of the Cropper size grid.
+- synthetic_source(): deterministic noisy gradient with the aspect of the print, like a phone photo.
+- run_size(): renders one size and returns its stage timings (see `PhotoProc.timings`), peak RSS and output size.
+- compare(): prints the difference with the baseline and returns the list of regressions.
+
+Usage:
+    python -m benchmarks.photo_processing_benchmark
+    python -m benchmarks.photo_processing_benchmark --sizes 20x30 60x90 --save-baseline
+    python -m benchmarks.photo_processing_benchmark --compare --tolerance 0.2
+
+Notes:
+- The process exits with code 1 if `--compare` finds a size slower or heavier than the baseline by more than the tolerance.
+- Baselines are machine specific, store them per render machine.
+"""
+
+import argparse
+import json
+import multiprocessing
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict
+from pathlib import Path
+
+import numpy as np
+import psutil
+from PIL import Image
+
+from data import data
+from photo_processing import PhotoProc
+from photo_processing.render_executor import apply_settings
+
+SIZES = [(20, 30), (30, 40), (30, 45), (30, 55),
+         (40, 60), (45, 60), (40, 70), (50, 60),
+         (50, 70), (60, 80), (60, 90), (90, 120),
+
+         (20, 20), (30, 30), (35, 35), (40, 40),
+         (50, 50), (60, 60), (70, 70), (80, 80),
+         (90, 90), (100, 100), (110, 110),
+
+         (20, 35), (20, 40), (25, 30), (30, 50),
+         (30, 60), (40, 50), (40, 80), (40, 90),
+         (50, 55), (50, 75), (50, 80), (50, 90),
+         (70, 80), (70, 90), (70, 120), (80, 110),
+         (80, 120), (80, 130), (90, 110), (90, 130)]
+
+SOURCE_LONG_SIDE = 6000  # 24 MP for 2:3, a typical phone photo
+BASELINE_PATH = Path(__file__).with_name('baseline.json')
+
+
+def synthetic_source(width_cm, height_cm, long_side=SOURCE_LONG_SIDE):
+    scale = long_side / max(width_cm, height_cm)
+    width, height = round(width_cm * scale), round(height_cm * scale)
+
+    rng = np.random.default_rng(0)
+    y, x = np.ogrid[0:height, 0:width]
+    pixels = np.empty((height, width, 3), dtype=np.uint8)
+    pixels[..., 0] = x * 255 // width
+    pixels[..., 1] = y * 255 // height
+    pixels[..., 2] = (x + y) % 256
+    pixels += rng.integers(0, 24, size=pixels.shape, dtype=np.uint8)  # Keeps JPEG from compressing it to nothing
+    return Image.fromarray(pixels, 'RGB')
+
+
+def peak_rss():
+    """Peak resident memory of the current process in bytes."""
+    memory = psutil.Process().memory_info()
+    if hasattr(memory, 'peak_wset'):  # Windows
+        return memory.peak_wset
+
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+
+
+def run_size(size, settings):
+    """Renders one print size. Runs in a fresh worker process."""
+    apply_settings(settings)
+    width_cm, height_cm = size
+    image = synthetic_source(width_cm, height_cm)
+
+    processing = PhotoProc()
+    processing.presets(image=image, number='1234', width_cm=width_cm, height_cm=height_cm)
+    pixels = processing.canvas_size()
+    del image
+
+    start = time.perf_counter()
+    filepath = processing.process_image()
+    total = time.perf_counter() - start
+
+    output_bytes = filepath.stat().st_size
+    filepath.unlink()
+
+    return {
+        'total_s': total,
+        'stages_s': processing.timings,
+        'peak_rss_mb': peak_rss() / 2 ** 20,
+        'output_mb': output_bytes / 2 ** 20,
+        'output_px': pixels
+    }
+
+
+def run(sizes, output_dir):
+    settings = asdict(data)
+    settings['photo_processing_path'] = output_dir
+    context = multiprocessing.get_context('spawn')
+
+    results = {}
+    for size in sizes:
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            result = pool.submit(run_size, size, settings).result()
+        results[f'{size[0]}x{size[1]}'] = result
+        print_result(f'{size[0]}x{size[1]}', result)
+    return results
+
+
+def print_result(name, result):
+    stages = ' '.join(f'{stage}={seconds:.2f}' for stage, seconds in result['stages_s'].items())
+    print(f"{name:>8}  total {result['total_s']:6.2f}s  peak {result['peak_rss_mb']:7.0f} MB  "
+          f"output {result['output_mb']:6.1f} MB {result['output_px'][0]}x{result['output_px'][1]}  {stages}")
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for name, result in results.items():
+        reference = baseline.get(name)
+        if not reference:
+            print(f'{name:>8}  no baseline')
+            continue
+
+        time_change = result['total_s'] / reference['total_s'] - 1
+        memory_change = result['peak_rss_mb'] / reference['peak_rss_mb'] - 1
+        print(f'{name:>8}  time {time_change:+7.1%}  peak RSS {memory_change:+7.1%}')
+        if time_change > tolerance or memory_change > tolerance:
+            regressions.append(name)
+    return regressions
+
+
+def parse_size(text):
+    width, height = text.lower().replace('х', 'x').split('x')
+    return int(width), int(height)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmarks PhotoProc.process_image() on the Cropper size grid.')
+    parser.add_argument('--sizes', nargs='+', type=parse_size, default=SIZES, help='print sizes like 20x30')
+    parser.add_argument('--dpi', type=int, default=data.photo_processing_dpi)
+    parser.add_argument('--baseline', type=Path, default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true', help='store the results as the new baseline')
+    parser.add_argument('--compare', action='store_true', help='compare the results with the baseline')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed slowdown, 0.2 is 20%%')
+    args = parser.parse_args(argv)
+
+    data.photo_processing_dpi = args.dpi
+    print(f'PhotoProc benchmark: {len(args.sizes)} sizes at {args.dpi} dpi, '
+          f'wrap engine {data.photo_processing_wrap_engine}')
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        results = run(args.sizes, output_dir)
+
+    if args.compare:
+        baseline = json.loads(args.baseline.read_text(encoding='utf-8'))
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"Regressions: {', '.join(regressions)}")
+            return 1
+
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(results, indent=2), encoding='utf-8')
+        print(f'Baseline saved: {args.baseline}')
+    return 0
+
+
+if __name__ == '__main__':
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -1,7 +1,7 @@
 import logging
 
 from PyQt5.QtWidgets import QGraphicsRectItem, QGraphicsItem, QApplication
-from PyQt5.QtGui import QPen, QPainterPath, QBrush, QColor
+from PyQt5.QtGui import QPen, QBrush, QColor
 from PyQt5.QtCore import Qt, QObject, QEvent, QRectF, QPointF
 
 logger = logging.getLogger(__name__)
@@ -69,26 +69,50 @@ class DarkOverlay(QGraphicsItem):
         self.crop_frame = crop_frame
         self.setOpacity(0.6)
         self.setAcceptedMouseButtons(Qt.NoButton)
+        self.setFlag(QGraphicsItem.ItemUsesExtendedStyleOption)  # Real exposed rect in paint()
         self.overlay_color = QColor("#000000")
 
+        # Cached geometry: the overlay is up to four bands around the crop frame
+        self.hole = QRectF()
+        self.bands = [self.scene_rect]
+
     def boundingRect(self):
         return self.scene_rect
 
-    def paint(self, painter, option, widget=None):
-        painter.setBrush(QBrush(self.overlay_color))
-        painter.setPen(Qt.NoPen)
+    def set_hole(self, hole):
+        self.hole = QRectF(hole)
+        top, bottom = max(hole.top(), self.scene_rect.top()), min(hole.bottom(), self.scene_rect.bottom())
+        self.bands = [
+            QRectF(QPointF(self.scene_rect.left(), self.scene_rect.top()), QPointF(self.scene_rect.right(), top)),
+            QRectF(QPointF(self.scene_rect.left(), bottom), QPointF(self.scene_rect.right(), self.scene_rect.bottom())),
+            QRectF(QPointF(self.scene_rect.left(), top), QPointF(max(hole.left(), self.scene_rect.left()), bottom)),
+            QRectF(QPointF(min(hole.right(), self.scene_rect.right()), top), QPointF(self.scene_rect.right(), bottom)),
+        ]
+        self.bands = [band for band in self.bands if band.isValid()]
+
+    def update_hole(self):
+        """Rebuilds the bands when the crop frame moved or changed size, and repaints only the area that changed."""
+        hole = self.crop_frame.sceneBoundingRect()
+        if hole == self.hole:
+            return
 
-        full = QPainterPath()
-        full.addRect(self.scene_rect)
+        changed = hole.united(self.hole) if self.hole.isValid() else self.scene_rect
+        self.set_hole(hole)
+        self.update(changed)
 
-        hole = QPainterPath()
-        hole.addRect(self.crop_frame.sceneBoundingRect())
+    def paint(self, painter, option, widget=None):
+        hole = self.crop_frame.sceneBoundingRect()
+        if hole != self.hole:
+            self.set_hole(hole)
 
-        final_path = full.subtracted(hole)
-        painter.drawPath(final_path)
+        for band in self.bands:
+            exposed = band.intersected(option.exposedRect)
+            if not exposed.isEmpty():
+                painter.fillRect(exposed, self.overlay_color)
 
     def color(self, clr=QColor("#000000")):
         self.overlay_color = clr
+        self.update()
 
 
 class ResizeHandle(QGraphicsItem):
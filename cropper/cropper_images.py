@@ -0,0 +1,50 @@
+"""Cropper Images
+
+Converts Pillow images to Qt without encoding them: the pixels of a Pillow image are copied out
+with `tobytes()` in the layout of the matching `QImage` format and stride, and Qt builds the image from them.
+
+Main parts:
+------------
+- pil_to_qimage(): Pillow image -> `QImage` that owns its pixels (for the test render thread).
+- pil_to_pixmap(): Pillow image -> `QPixmap` for the graphics scenes.
+
+Usage:
+    from cropper.cropper_images import pil_to_pixmap
+
+    pixmap = pil_to_pixmap(image)
+
+Notes:
+- RGB is passed as RGBX (4 bytes per pixel), the layout Pillow keeps RGB in, so rows are copied as they are
+  and every row is 32-bit aligned, as Qt wants it.
+- A `QImage` built over a bytes object does not own them: `pil_to_qimage()` returns a detached copy,
+  `pil_to_pixmap()` converts to a pixmap while the bytes are still alive.
+"""
+
+from PIL import Image
+from PyQt5.QtGui import QImage, QPixmap
+
+QT_FORMATS = {
+    'RGB': ('RGBX', QImage.Format_RGBX8888),
+    'RGBA': ('RGBA', QImage.Format_RGBA8888),
+    'L': ('L', QImage.Format_Grayscale8),
+}
+
+
+def _raw_qimage(image: Image.Image) -> tuple[QImage, bytes]:
+    """`QImage` over a raw copy of the pixels. It is valid only while the returned bytes are alive."""
+    if image.mode not in QT_FORMATS:
+        image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+
+    raw_mode, qt_format = QT_FORMATS[image.mode]
+    buffer = image.tobytes('raw', raw_mode)
+    return QImage(buffer, image.width, image.height, len(buffer) // max(1, image.height), qt_format), buffer
+
+
+def pil_to_qimage(image: Image.Image) -> QImage:
+    qimage, buffer = _raw_qimage(image)
+    return qimage.copy()  # Owns its pixels, the buffer can go
+
+
+def pil_to_pixmap(image: Image.Image) -> QPixmap:
+    qimage, buffer = _raw_qimage(image)
+    return QPixmap.fromImage(qimage)  # Copies the pixels while the buffer is alive
@@ -1,5 +1,6 @@
 import sys
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 from PyQt5.QtWidgets import (
@@ -7,41 +8,53 @@ from PyQt5.QtWidgets import (
     QMainWindow,
     QGraphicsScene,
     QGraphicsPixmapItem,
+    QGraphicsRectItem,
+    QGraphicsItem,
     QShortcut,
     QFileDialog,
 )
 from PyQt5.QtGui import (
-    QPixmap,
-    QTransform,
     QKeySequence,
     QColor,
-    QImage,
-    QIcon
+    QPen,
+    QIcon,
+    QPixmap
 )
 from PyQt5.QtCore import (
     QRectF,
     Qt,
     QFile,
     QTextStream,
-    QTimer
+    QTimer,
+    pyqtSignal
 )
 from PIL import Image
-import pillow_heif
-import io
 
 from cropper.cropper_help import SendyHelp
+from cropper.cropper_images import pil_to_qimage
+from cropper.cropper_pyramid import DisplayPyramid
 from cropper.cropper_ui import Ui_Cropper
 from cropper.cropper_settings import SendySettings
 from cropper.cropper_save import SendySave
 from cropper.cropper_crop_frame import CropFrame, DarkOverlay, ResizeHandle, WheelFilter
 from data import data
 from photo_processing import PhotoProc
+from photo_processing.decoders import decode
+from photo_processing.orientation import rotation_orientation
+from photo_processing.shared_image import SharedImage
 import resources_rc
 
 logger = logging.getLogger(__name__)
 
+TEST_DEBOUNCE_MS = 100  # Test button presses closer than this start one render
+DISPLAY_ZOOM = 2  # An opened file is decoded at this many screens, the preview view magnifies the crop area
+
+test_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='cropper_test')  # Test renders, one at a time
+
 
 class SendyCropper(QMainWindow):
+    test_ready = pyqtSignal(int, object)  # Test render number, QImage or None, from the test thread
+
     def __init__(self):
         super().__init__()
 
@@ -62,12 +75,16 @@ class SendyCropper(QMainWindow):
         # Internal state variables
         _instance = None  # static instance for single window
 
-        self.pixmap_main = None
+        self.pyramid = None  # Display levels of the photo, scene coordinates are source pixels
         self.image_item = None
+        self.image_level = None
         self.original_image = None
-        self.cropped_image = None
+        self.image_source = None  # Goes to the render instead of the pixels: a SharedImage, a file path or the image
+        self.preview_rect = None  # Crop frame in scene coordinates, shown by the preview view
+        self.preview_level = None
         self.cropped_result_image = None
         self.result = None
+        self.on_close = None  # Called with the result when the window is closed (Cropper process)
 
         self.rotation_angle = 0
         self.crop_width = 0
@@ -81,6 +98,28 @@ class SendyCropper(QMainWindow):
         # Graphics scenes
         self.scene = QGraphicsScene()
         self.scene_preview = QGraphicsScene()
+        self.scene_test = None
+
+        # Live preview: the shown pyramid level, clipped to the crop frame. Built once, only moved afterwards
+        self.preview_clip = QGraphicsRectItem()
+        self.preview_clip.setPen(QPen(Qt.NoPen))
+        self.preview_clip.setFlag(QGraphicsItem.ItemClipsChildrenToShape)
+        self.preview_item = QGraphicsPixmapItem(self.preview_clip)
+        self.preview_item.setTransformationMode(Qt.SmoothTransformation)
+        self.scene_preview.addItem(self.preview_clip)
+
+        self.preview_timer = QTimer(self)
+        self.preview_timer.setSingleShot(True)
+        self.preview_timer.setInterval(16)  # At most one preview refresh per frame at 60 Hz
+        self.preview_timer.timeout.connect(self.refresh_preview)
+
+        # Test renders run in `test_executor`, only the result of the newest one is shown
+        self.test_generation = 0
+        self.test_future = None
+        self.test_timer = QTimer(self)
+        self.test_timer.setSingleShot(True)
+        self.test_timer.timeout.connect(self.start_test)
+        self.test_ready.connect(self.show_test)
 
         # Graphics items
         self.crop_frame = None
@@ -144,6 +183,7 @@ class SendyCropper(QMainWindow):
 
     # UI
     def set_QSS(self):
+        self.qss = data.cropper_css
         try:
             qss_file = QFile(data.cropper_css)
             if not qss_file.exists():
@@ -200,24 +240,71 @@ class SendyCropper(QMainWindow):
         self.rescale_main()
         self.rescale_preview()
 
-    # Set image and other presets
-    def load_image(self, image):
-        self.original_image = image
+    def closeEvent(self, event):
+        super().closeEvent(event)
+        self.cancel_test()
+        if self.on_close:
+            on_close, self.on_close = self.on_close, None
+            on_close(self.result)
+
+    def reset(self):
+        """Returns the window to the state of a new one, so a hidden warm window can take the next job."""
+        self.cancel_test()
+        self.preview_timer.stop()
+        self.test_timer.stop()
+
+        self.scene.clear()
+        self.ui.graphicsView_main.setScene(None)
+        self.ui.graphicsView_main.setStyleSheet('')
+        self.ui.graphicsView_preview.setScene(None)
+        self.scene_test = None
+        self.crop_frame = None
+        self.overlay = None
+        self.resize_handle = None
 
-        def pil_image_to_pixmap(pil_image):
-            buffer = io.BytesIO()
-            pil_image.save(buffer, format="PNG")
-            qimage = QImage()
-            qimage.loadFromData(buffer.getvalue(), "PNG")
-            return QPixmap.fromImage(qimage)
+        self.pyramid = None
+        self.image_item = None
+        self.image_level = None
+        self.preview_level = None
+        self.preview_rect = None
+        self.preview_item.setPixmap(QPixmap())
+        self.original_image = None
+        self.image_source = None
+        self.result = None
+        self.on_close = None
 
-        if isinstance(image, Image.Image):
-            image = pil_image_to_pixmap(image)
+        self.rotation_angle = 0
+        self.crop_width = 0
+        self.crop_height = 0
+        self.frame_coordinates = (0, 0, 0, 0)
+
+        if self.save_window is not None:
+            self.save_window.deleteLater()
+            self.save_window = None
+
+        for line_edit in (self.ui.lineEdit_number, self.ui.lineEdit_width, self.ui.lineEdit_height):
+            line_edit.blockSignals(True)  # No size checks without an image
+            line_edit.clear()
+            line_edit.setStyleSheet('')
+            line_edit.blockSignals(False)
+        self.statusBar().clearMessage()
+
+    # Set image and other presets
+    def load_image(self, image, source_size=None):
+        """Shows `image`. `source_size` is the size of the photo it was decoded from at reduced size,
+        the crop frame is always in source pixels."""
+        self.image_source = image
+        if isinstance(image, SharedImage):
+            image = image.open()
+        self.original_image = image
 
-        self.pixmap_main = image
-        self.image_item = QGraphicsPixmapItem(self.pixmap_main)
-        if self.pixmap_main:
-            self.scene.setSceneRect(0, 0, self.pixmap_main.width(), self.pixmap_main.height())
+        self.pyramid = DisplayPyramid(image, source_size) if isinstance(image, Image.Image) else None
+        self.image_item = QGraphicsPixmapItem()
+        self.image_item.setTransformationMode(Qt.SmoothTransformation)
+        self.image_level = None
+        self.preview_level = None
+        if self.pyramid:
+            self.scene.setSceneRect(0, 0, self.pyramid.width(), self.pyramid.height())
         self.scene.addItem(self.image_item)
         self.ui.graphicsView_main.setScene(self.scene)
         self.rescale_main()
@@ -242,21 +329,28 @@ class SendyCropper(QMainWindow):
             self.resize_handle = None
             self.rotation_angle = 0
             self.ui.graphicsView_main.setScene(None)
-            self.scene_preview.clear()
+            self.preview_level = None
             self.ui.graphicsView_preview.setScene(None)
-            pillow_heif.register_heif_opener()
-            Image.MAX_IMAGE_PIXELS = None
-            image = Image.open(image_path).convert("RGB")
+            image = decode(image_path, max_side=self.display_side())
             if not image:
                 logging.info('Не удалось загрузить изображение')
                 self.statusBar().showMessage("Не удалось загрузить изображение", 3000)
                 return
-            self.load_image(image)
+            with Image.open(image_path) as header:  # Reads the header only
+                source_size = header.size
+            self.load_image(image, source_size)
+            self.image_source = image_path  # The render worker decodes the file itself
             self.ui.graphicsView_main.setStyleSheet('')
         except:
             logger.exception('load image error')
             self.statusBar().showMessage("Ошибка при открытии файла", 3000)
 
+    def display_side(self) -> int:
+        """Longest side in pixels an opened file is decoded at, `DISPLAY_ZOOM` screens in device pixels."""
+        screen = QApplication.primaryScreen()
+        size = screen.size()
+        return int(max(size.width(), size.height()) * screen.devicePixelRatio() * DISPLAY_ZOOM)
+
     def set_number(self, number):
         self.ui.lineEdit_number.setText(str(number))
 
@@ -349,29 +443,40 @@ class SendyCropper(QMainWindow):
         graphics_view.scale(scale, scale)
 
     def rescale_main(self):
-        if self.pixmap_main is None:
+        if self.pyramid is None:
             logging.debug('No image for rescale main')
             return
 
         self.rescale_graphics_view(self.ui.graphicsView_main,
-                                   self.image_item.pixmap().width(),
-                                   self.image_item.pixmap().height(),
+                                   self.pyramid.width(),
+                                   self.pyramid.height(),
                                    0.005
                                    )
+        self.show_level()
+
+    def show_level(self):
+        """Shows the smallest pyramid level that still covers the main view in device pixels."""
+        view = self.ui.graphicsView_main
+        pixels = max(self.pyramid.width(), self.pyramid.height()) * view.transform().m11() * view.devicePixelRatioF()
+        level = self.pyramid.level_for(pixels)
+        if level != self.image_level:
+            self.image_level = level
+            self.image_item.setPixmap(self.pyramid.pixmap(level))
+            self.image_item.setTransform(self.pyramid.level_transform(level))
 
     def rescale_preview(self):
-        if self.cropped_image is None:
+        if self.preview_rect is None or self.ui.graphicsView_preview.scene() is not self.scene_preview:
             logging.debug('No image for preview rescale')
             return
 
         self.rescale_graphics_view(self.ui.graphicsView_preview,
-                                   self.cropped_image.width(),
-                                   self.cropped_image.height(),
+                                   self.preview_rect.width(),
+                                   self.preview_rect.height(),
                                    0.05
                                    )
 
     def update_preview(self):
-        if self.pixmap_main is None:
+        if self.pyramid is None:
             logging.debug("No image for update_preview")
             return
 
@@ -380,15 +485,37 @@ class SendyCropper(QMainWindow):
             return
 
         crop_frame_XY = self.crop_frame.sceneBoundingRect()
-        self.cropped_image = self.pixmap_main.copy(int(crop_frame_XY.x()) + 1, int(crop_frame_XY.y()) + 1,
-                                                   self.crop_width,
-                                                   self.crop_height)  # +1 это пиксель красной рамки заходящий за край
+        # +1 это пиксель красной рамки заходящий за край
         self.frame_coordinates = (
             int(crop_frame_XY.x()) + 1, int(crop_frame_XY.y()) + 1, self.crop_width, self.crop_height)
-        self.scene_preview = QGraphicsScene()
-        self.scene_preview.addPixmap(self.cropped_image)
-        self.ui.graphicsView_preview.setScene(self.scene_preview)
         self.resize_handle.update_position()
+        self.overlay.update_hole()
+
+        # The running test is for the old frame
+        self.cancel_test()
+        if data.cropper_auto_test_ms:
+            self.test_timer.start(data.cropper_auto_test_ms)
+
+        # Moving the frame calls this many times per frame, the preview is redrawn once after them
+        if not self.preview_timer.isActive():
+            self.preview_timer.start()
+
+    def refresh_preview(self):
+        if self.pyramid is None or self.crop_frame is None:
+            return
+
+        view = self.ui.graphicsView_preview
+        self.preview_rect = QRectF(*self.frame_coordinates)
+        level = self.pyramid.region_level(self.preview_rect, max(view.width(), view.height()) * view.devicePixelRatioF())
+        if level != self.preview_level:
+            self.preview_level = level
+            self.preview_item.setPixmap(self.pyramid.pixmap(level))  # The same pixmap as the level, not a copy
+            self.preview_item.setTransform(self.pyramid.level_transform(level))
+
+        self.preview_clip.setRect(self.preview_rect)
+        if view.scene() is not self.scene_preview:
+            view.setScene(self.scene_preview)
+        view.setSceneRect(self.preview_rect)
         self.rescale_preview()
 
     # Tool buttons
@@ -399,7 +526,7 @@ class SendyCropper(QMainWindow):
                               }
                           """
 
-        if self.pixmap_main is None:
+        if self.pyramid is None:
             logging.debug('No image for rotation')
             self.statusBar().showMessage("Нет изображения для поворота.", 2000)
             self.ui.graphicsView_main.setStyleSheet(error_image_qss)
@@ -407,15 +534,10 @@ class SendyCropper(QMainWindow):
 
         self.ui.graphicsView_main.setStyleSheet('')
 
-        rotated = self.pixmap_main.transformed(QTransform().rotate(90))
-        self.scene.setSceneRect(0, 0, rotated.width(), rotated.height())
-        self.pixmap_main = rotated
-
-        if hasattr(self, 'image_item') and self.image_item:
-            self.image_item.setPixmap(self.pixmap_main)
-        else:
-            self.image_item = QGraphicsPixmapItem(self.pixmap_main)
-            self.scene.addItem(self.image_item)
+        self.pyramid.rotate()  # Only the shown levels are turned, never the full-resolution photo
+        self.scene.setSceneRect(0, 0, self.pyramid.width(), self.pyramid.height())
+        self.image_level = None
+        self.preview_level = None
         self.rescale_main()
         self.create_crop_frame()
 
@@ -500,7 +622,7 @@ class SendyCropper(QMainWindow):
                               }
                           """
 
-        if self.pixmap_main is None:
+        if self.pyramid is None:
             logging.debug('No image for lineedit_width_or_height_changed')
             self.statusBar().showMessage("Нет изображения.", 3000)
             self.ui.graphicsView_main.setStyleSheet(error_image_qss)
@@ -512,7 +634,7 @@ class SendyCropper(QMainWindow):
             self.crop_width = int(self.ui.lineEdit_width.text())
             self.ui.lineEdit_width.setStyleSheet('')
             if 0 >= int(self.ui.lineEdit_width.text()) or int(
-                    self.ui.lineEdit_width.text()) > self.pixmap_main.width():
+                    self.ui.lineEdit_width.text()) > self.pyramid.width():
                 raise ValueError
         except ValueError:
             self.ui.lineEdit_width.setStyleSheet(error_qss)
@@ -527,7 +649,7 @@ class SendyCropper(QMainWindow):
             self.crop_height = int(self.ui.lineEdit_height.text())
             self.ui.lineEdit_height.setStyleSheet('')
             if 0 >= int(self.ui.lineEdit_height.text()) or int(
-                    self.ui.lineEdit_height.text()) > self.pixmap_main.height():
+                    self.ui.lineEdit_height.text()) > self.pyramid.height():
                 raise ValueError
         except ValueError:
             self.ui.lineEdit_height.setStyleSheet(error_qss)
@@ -549,7 +671,7 @@ class SendyCropper(QMainWindow):
         if self.resize_handle:
             self.scene.removeItem(self.resize_handle)
 
-        image_rect = self.image_item.boundingRect()
+        image_rect = self.scene.sceneRect()  # The source size, whatever pyramid level is shown
 
         if self.crop_width <= 20:
             scale = 30
@@ -623,8 +745,8 @@ class SendyCropper(QMainWindow):
             aspect_ratio = int(self.ui.lineEdit_width.text()) / int(self.ui.lineEdit_height.text())
             new_height = new_width / aspect_ratio
 
-            max_width = self.pixmap_main.width() - pos.x()
-            max_height = self.pixmap_main.height() - pos.y()
+            max_width = self.pyramid.width() - pos.x()
+            max_height = self.pyramid.height() - pos.y()
 
             if new_width > max_width:
                 new_width = max_width
@@ -646,6 +768,10 @@ class SendyCropper(QMainWindow):
 
     # On Test button
     def test(self):
+        self.test_timer.start(TEST_DEBOUNCE_MS)
+
+    def start_test(self):
+        """Starts the print preview render in `test_executor`, the window stays responsive meanwhile."""
         if not self.crop_frame:
             return
 
@@ -655,36 +781,74 @@ class SendyCropper(QMainWindow):
             self.frame_coordinates[0] + self.frame_coordinates[2],
             self.frame_coordinates[1] + self.frame_coordinates[3]
         )
+        try:
+            width_cm, height_cm = int(self.ui.lineEdit_width.text()), int(self.ui.lineEdit_height.text())
+        except ValueError:
+            return
 
-        img = self.original_image
-        img = img.rotate(self.rotation_angle, expand=True)
-
-        process_image = PhotoProc()
-        process_image.presets(
-            image=img,
-            number=self.ui.lineEdit_number.text(),
-            width_cm=int(self.ui.lineEdit_width.text()),
-            height_cm=int(self.ui.lineEdit_height.text()),
-            material=None,
-            coordinates=coordinates
-        )
-        process_image.set_dpi(150)
+        # The test renders from the decoded photo, which is smaller than the source for an opened file
+        scale_x, scale_y = self.pyramid.level_scale(0)
+        coordinates = tuple(round(value / scale) for value, scale in zip(coordinates, (scale_x, scale_y) * 2))
 
-        preview = process_image.get_result_image()
+        view = self.ui.graphicsView_preview
+        preview_side = int(max(view.width(), view.height()) * view.devicePixelRatioF())
 
-        def pil_image_to_pixmap(pil_image):
-            buffer = io.BytesIO()
-            pil_image.save(buffer, format="PNG")
-            qimage = QImage()
-            qimage.loadFromData(buffer.getvalue(), "PNG")
-            return QPixmap.fromImage(qimage)
+        self.cancel_test()
+        self.test_future = test_executor.submit(
+            self.render_test, self.test_generation, self.original_image, self.rotation_angle,
+            self.ui.lineEdit_number.text(), width_cm, height_cm, coordinates, preview_side
+        )
+        view.setCursor(Qt.BusyCursor)
+        self.statusBar().showMessage("Тестовый рендер...")
+
+    def cancel_test(self):
+        """Drops the test render in progress: a queued one does not start, a running one is not shown."""
+        self.test_generation += 1
+        if self.test_future is not None:
+            self.test_future.cancel()
+            self.test_future = None
+            self.ui.graphicsView_preview.unsetCursor()
+            self.statusBar().clearMessage()
+
+    def render_test(self, generation, image, rotation_angle, number, width_cm, height_cm, coordinates, preview_side):
+        """Runs in the test thread, must not touch widgets: the result goes back with `test_ready`."""
+        if generation != self.test_generation:
+            return
 
-        if isinstance(preview, Image.Image):
-            preview = pil_image_to_pixmap(preview)
+        try:
+            # The photo is not rotated, the crop box is mapped to it and only the cropped part is turned
+            process_image = PhotoProc()
+            process_image.presets(
+                image=image,
+                number=number,
+                width_cm=width_cm,
+                height_cm=height_cm,
+                material=None,
+                coordinates=coordinates,
+                orientation=rotation_orientation(rotation_angle)
+            )
+            preview = process_image.get_result_image(max_side=preview_side)
+            self.test_ready.emit(generation, pil_to_qimage(preview))
+        except Exception:
+            logger.exception('Test render error')
+            self.test_ready.emit(generation, None)
+
+    def show_test(self, generation, qimage):
+        if generation != self.test_generation:
+            return  # The frame moved or a newer test started
+        self.test_future = None
+        self.ui.graphicsView_preview.unsetCursor()
+        self.statusBar().clearMessage()
+
+        if qimage is None:
+            self.statusBar().showMessage("Ошибка тестового рендера", 3000)
+            return
 
-        self.scene_preview = QGraphicsScene()
-        self.scene_preview.addItem(QGraphicsPixmapItem(preview))
-        self.ui.graphicsView_preview.setScene(self.scene_preview)
+        preview = QPixmap.fromImage(qimage)
+        self.scene_test = QGraphicsScene()
+        self.scene_test.addItem(QGraphicsPixmapItem(preview))
+        self.ui.graphicsView_preview.setScene(self.scene_test)
+        self.ui.graphicsView_preview.setSceneRect(self.scene_test.itemsBoundingRect())
 
         view_width = self.ui.graphicsView_preview.width()
         view_height = self.ui.graphicsView_preview.height()
@@ -697,6 +861,9 @@ class SendyCropper(QMainWindow):
     # On Crop button
     def crop_and_close(self, material=None):
         try:
+            if self.image_source is None:
+                return
+
             material_dict = {0: 'Холст',
                              1: 'Баннер',
                              2: 'Хлопок',
@@ -712,15 +879,15 @@ class SendyCropper(QMainWindow):
                 self.frame_coordinates[1] + self.frame_coordinates[3]
             )
 
-            img = self.original_image
-            img = img.rotate(self.rotation_angle, expand=True)
+            # The photo is not rotated here, the render turns only the cropped part
             result_dict = {
-                'image': img,
+                'image': self.image_source,
                 'number': self.ui.lineEdit_number.text(),
                 'width_cm': int(self.ui.lineEdit_width.text()),
                 'height_cm': int(self.ui.lineEdit_height.text()),
                 'material': material_dict[material],
-                'coordinates': coordinates
+                'coordinates': coordinates,
+                'orientation': rotation_orientation(self.rotation_angle)
             }
 
             self.result = result_dict
@@ -732,6 +899,32 @@ class SendyCropper(QMainWindow):
             self.close()
 
 
+def open_cropper_window(
+        image=None,
+        number='',
+        material='Холст',
+        width=None,
+        height=None,
+        on_close=None,
+        window=None
+):
+    """Opens a Cropper window in the running `QApplication`. `on_close` gets the result when it is closed.
+    `window` is a hidden warm window after `reset()`, a new one is built if it is not given."""
+    if window is None:
+        window = SendyCropper()
+    elif window.qss != data.cropper_css:
+        window.set_QSS()
+    window.on_close = on_close
+    window.showNormal()
+    window.load_image(image)
+    window.set_number(number)
+    window.set_width_and_height(width, height)
+    window.set_material(material)
+    window.raise_()
+    window.activateWindow()
+    return window
+
+
 def sendy_cropper(
         image=None,
         number='',
@@ -739,14 +932,10 @@ def sendy_cropper(
         width=None,
         height=None,
 ):
+    """Runs the Cropper as a standalone app. The bot uses `cropper_service` instead."""
     try:
         app = QApplication(sys.argv)
-        window = SendyCropper()
-        window.showNormal()
-        window.load_image(image)
-        window.set_number(number)
-        window.set_width_and_height(width, height)
-        window.set_material(material)
+        window = open_cropper_window(image, number, material, width, height)
         app.exec_()
 
         return window.result
@@ -0,0 +1,103 @@
+"""Cropper Pyramid
+
+Multi-resolution copies of the Cropper photo for display, so the graphics views never hold
+or transform the full-resolution image.
+
+The source is halved with `Image.reduce(2)` until its longest side is below `MIN_SIDE`. The main and
+preview views show the smallest level that still has a pixel for every device pixel on screen.
+A level is scaled up in the scene to the source size, so scene coordinates stay source pixels:
+the crop frame maps to the source exactly, whatever level is shown. The final crop is still taken from
+the full-resolution source.
+
+The pyramid may be built from a copy decoded at reduced size (an opened file): with `source_size`,
+the scene still has the size of the source and level 0 is scaled up like the other levels.
+
+Main parts:
+------------
+- DisplayPyramid: levels of one photo with their pixmaps.
+  - level_for(): smallest level with at least the requested number of pixels on the longest side.
+  - pixmap(): pixmap of a level in the current rotation, converted once and cached.
+  - level_transform(): scales a level up to scene (source) coordinates.
+  - region_level(): smallest level that shows a scene rectangle with the requested number of pixels.
+  - rotate(): turns the display 90 degrees clockwise, only the levels shown later are transposed.
+
+Usage:
+    pyramid = DisplayPyramid(image)
+    level = pyramid.level_for(1800)
+    item = QGraphicsPixmapItem(pyramid.pixmap(level))
+    item.setTransform(pyramid.level_transform(level))
+"""
+
+import logging
+
+from PIL import Image
+from PyQt5.QtCore import QRectF
+from PyQt5.QtGui import QPixmap, QTransform
+
+from cropper.cropper_images import pil_to_pixmap
+
+logger = logging.getLogger(__name__)
+
+MIN_SIDE = 512  # No levels below this longest side
+
+# Quarter turns clockwise -> transpose, like `QTransform().rotate(90)` on the screen
+QUARTER_TURNS = {
+    1: Image.Transpose.ROTATE_270,
+    2: Image.Transpose.ROTATE_180,
+    3: Image.Transpose.ROTATE_90,
+}
+
+
+class DisplayPyramid:
+    def __init__(self, image: Image.Image, source_size: tuple[int, int] | None = None):
+        self.source_size = source_size or image.size
+        self.levels = [image]
+        while max(self.levels[-1].size) >= MIN_SIDE * 2:
+            self.levels.append(self.levels[-1].reduce(2))
+        self.quarter_turns = 0
+        self._pixmaps: dict[int, QPixmap] = {}
+        logger.debug(f'Display pyramid: {[level.size for level in self.levels]}')
+
+    def _rotated(self, size: tuple[int, int]) -> tuple[int, int]:
+        width, height = size
+        return (height, width) if self.quarter_turns % 2 else (width, height)
+
+    def _size(self, level: int) -> tuple[int, int]:
+        return self._rotated(self.levels[level].size)
+
+    def width(self) -> int:
+        return self._rotated(self.source_size)[0]
+
+    def height(self) -> int:
+        return self._rotated(self.source_size)[1]
+
+    def level_for(self, pixels: float) -> int:
+        for level in range(len(self.levels) - 1, 0, -1):
+            if max(self.levels[level].size) >= pixels:
+                return level
+        return 0
+
+    def pixmap(self, level: int) -> QPixmap:
+        pixmap = self._pixmaps.get(level)
+        if pixmap is None:
+            image = self.levels[level]
+            if self.quarter_turns:
+                image = image.transpose(QUARTER_TURNS[self.quarter_turns])
+            pixmap = self._pixmaps[level] = pil_to_pixmap(image)
+        return pixmap
+
+    def level_scale(self, level: int) -> tuple[float, float]:
+        width, height = self._size(level)
+        return self.width() / width, self.height() / height
+
+    def level_transform(self, level: int) -> QTransform:
+        return QTransform.fromScale(*self.level_scale(level))
+
+    def region_level(self, rect: QRectF, pixels: float) -> int:
+        """Smallest level that has at least `pixels` on the longest side of `rect` (scene coordinates)."""
+        scale = pixels / max(rect.width(), rect.height(), 1)
+        return self.level_for(max(self.source_size) * scale)
+
+    def rotate(self) -> None:
+        self.quarter_turns = (self.quarter_turns + 1) % 4
+        self._pixmaps.clear()
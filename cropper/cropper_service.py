@@ -0,0 +1,202 @@
+"""Cropper Service
+
+Runs the Sendy Cropper in a long-lived companion process, so Qt starts once per session
+instead of once per photo, and hands the crop result back to the bot the moment the user presses Crop.
+
+The companion process owns one `QApplication` that keeps running between jobs. Jobs and results go
+through a `multiprocessing.Pipe`: the bot sends a job, the companion opens a Cropper window for it and
+sends the result back when the window is closed (a result dict after Crop, None if the window was just closed).
+On the bot side a reader thread resolves the future of the job, so `crop()` is a plain awaitable.
+
+Main parts:
+------------
+- CropperService: starts the companion process lazily and awaits Cropper jobs on it.
+  - crop(): opens a Cropper window for one image and returns its result.
+  - shutdown(): stops the companion process.
+- cropper_service: process-wide instance used by the bot and the tray.
+- cropper_process(): entry point of the companion process.
+
+Usage:
+    from cropper.cropper_service import cropper_service
+
+    result = await cropper_service.crop(image=SharedImage.create(image), number='1234', width=30, height=40)
+    if result:
+        filepath = await render_executor.render(RenderJob(**result))
+
+Notes:
+- With `data.cropper_warm_start` the bot starts the process on startup, and the process keeps a hidden, fully
+  built Cropper window: a job only loads its photo into it. A closed window is reset and kept for the next job.
+- Every job carries a snapshot of `data`, so the Cropper works with the current settings. Only the settings
+  changed in the Cropper (settings window) come back with the result and are applied to the bot's `data`,
+  so a setting the bot changed while the window was open is not overwritten with the old snapshot.
+- Pass the image as a `SharedImage`: only its handle is pickled to the Cropper, and the result comes back with
+  the same handle, the crop box and the rotation as an orientation, never with pixels.
+- If the companion process dies, the waiting jobs get None and the next job starts a new process.
+"""
+
+import asyncio
+import itertools
+import logging
+import multiprocessing
+import sys
+import threading
+from dataclasses import asdict
+
+from config import config
+from data import data
+
+logger = logging.getLogger(__name__)
+
+
+def cropper_process(connection) -> None:
+    """Entry point of the companion process: runs Qt and opens a Cropper window for every received job."""
+    logging.basicConfig(level=logging.getLevelName(level=config.log.level), format=config.log.format, style='{')
+
+    from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+    from PyQt5.QtWidgets import QApplication
+
+    from cropper.cropper_main import SendyCropper, open_cropper_window
+    from photo_processing.render_executor import apply_settings
+
+    class JobSignals(QObject):
+        job = pyqtSignal(object)
+        stop = pyqtSignal()
+
+    app = QApplication(sys.argv)
+    app.setQuitOnLastWindowClosed(False)  # The process waits for the next job with no window open
+    signals = JobSignals()
+    windows = {}
+    spare = []  # Hidden warm window waiting for a job
+    send_lock = threading.Lock()
+
+    def release(job_id):
+        # Runs after the close event of the window
+        window = windows.pop(job_id, None)
+        if window is not None and data.cropper_warm_start and not spare:
+            window.reset()
+            spare.append(window)
+
+    def open_job(message):
+        job_id, kwargs, settings = message
+        apply_settings(settings)
+
+        def finished(result):
+            QTimer.singleShot(0, lambda: release(job_id))
+            changed = {name: value for name, value in asdict(data).items() if settings.get(name) != value}
+            with send_lock:
+                connection.send((job_id, result, changed or None))
+
+        try:
+            window = spare.pop() if spare else None
+            windows[job_id] = open_cropper_window(**kwargs, on_close=finished, window=window)
+        except Exception:
+            logger.exception('Cannot open Cropper window')
+            finished(None)
+
+    def read_jobs():
+        # Runs in a thread, the signals hand the jobs over to the Qt thread
+        while True:
+            try:
+                message = connection.recv()
+            except (EOFError, OSError):
+                break
+            if message is None:
+                break
+            signals.job.emit(message)
+        signals.stop.emit()
+
+    signals.job.connect(open_job)
+    signals.stop.connect(app.quit)
+    threading.Thread(target=read_jobs, daemon=True).start()
+
+    if data.cropper_warm_start:
+        spare.append(SendyCropper())  # Built before the first job arrives
+    logger.info('Cropper process started')
+    app.exec_()
+
+
+class CropperService:
+    def __init__(self):
+        self._process = None
+        self._connection = None
+        self._futures: dict[int, asyncio.Future] = {}
+        self._job_ids = itertools.count()
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        """Starts the companion process if it is not running."""
+        with self._lock:
+            if self._process is not None and self._process.is_alive():
+                return
+
+            context = multiprocessing.get_context('spawn')
+            self._connection, child_connection = context.Pipe()
+            self._process = context.Process(target=cropper_process, args=(child_connection,),
+                                            name='SendyCropper', daemon=True)
+            self._process.start()
+            child_connection.close()
+            threading.Thread(target=self._read_results, args=(self._connection,), daemon=True).start()
+            logger.info(f'Cropper process {self._process.pid} started')
+
+    def _read_results(self, connection) -> None:
+        while True:
+            try:
+                job_id, result, settings = connection.recv()
+            except (EOFError, OSError):
+                break
+            future = self._futures.pop(job_id, None)
+            if future is not None:
+                future.get_loop().call_soon_threadsafe(self._resolve, future, result, settings)
+
+        # The process is gone: jobs still waiting get no result
+        logger.info('Cropper process stopped')
+        for job_id in list(self._futures):
+            future = self._futures.pop(job_id)
+            future.get_loop().call_soon_threadsafe(self._resolve, future, None, None)
+
+    @staticmethod
+    def _resolve(future: asyncio.Future, result, settings) -> None:
+        """Sets the result of a job. `settings` holds only the values changed in the Cropper."""
+        if settings:
+            for name, value in settings.items():
+                setattr(data, name, value)
+        if not future.done():
+            future.set_result(result)
+
+    def _send(self, message) -> None:
+        with self._lock:
+            self._connection.send(message)
+
+    async def crop(self, image=None, number='', width=None, height=None, material='Холст') -> dict | None:
+        """Opens a Cropper window for `image` and waits until it is closed.
+        Returns the `RenderJob` arguments after Crop, or None if the window was closed without cropping."""
+        self.start()
+        job_id = next(self._job_ids)
+        future = asyncio.get_running_loop().create_future()
+        self._futures[job_id] = future
+
+        kwargs = dict(image=image, number=number, width=width, height=height, material=material)
+        try:
+            await asyncio.to_thread(self._send, (job_id, kwargs, asdict(data)))  # An image that is not shared takes a while to pickle
+        except (OSError, ValueError):
+            logger.exception('Cannot send the job to the Cropper process')
+            self._futures.pop(job_id, None)
+            return None
+        return await future
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._process is None:
+                return
+            try:
+                self._connection.send(None)
+            except (OSError, ValueError):
+                pass
+            self._process.join(timeout=5)
+            if self._process.is_alive():
+                self._process.terminate()
+            self._connection.close()
+            self._process = None
+
+
+cropper_service = CropperService()
@@ -42,6 +42,7 @@ from PyQt5.QtCore import Qt, QFile, QTextStream
 
 from cropper.settings_ui import Ui_SendySettings
 from data import data
+from photo_processing import clear_text_cache
 
 logger = logging.getLogger(__name__)
 
@@ -364,6 +365,7 @@ class SendySettings(QDialog):
         data.image_loader_parsing_urgent = self.ui.lineEdit_image_loader_parsing_urgent.text()
 
         data.save()
+        clear_text_cache()
         self.accept()
 
 
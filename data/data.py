@@ -26,8 +26,33 @@ Attributes:
     photo_processing_crop_px (int): Cropping border of image in pixels.
     photo_processing_font_size_px (int): Font size in pixels for nuber on image.
     photo_processing_strip_length_px (int): Font size in pixels for nuber on image.
+    photo_processing_wrap_engine (str): Engine used to build the wrap: 'pillow' or 'numpy'.
+    photo_processing_single_canvas (bool): Render wrap and white frame into one canvas allocated once.
+    photo_processing_workers (int): Number of render worker processes (0 - one per CPU core).
+    photo_processing_icc_path (str): ICC profile for images without an embedded one (built-in sRGB if missing).
+    photo_processing_material_icc (dict[str, str]): Output ICC profile path per material, images are converted to it.
+    photo_processing_streaming_mpx (int): Canvas size in megapixels from which prints are rendered in bands (0 - never).
+    photo_processing_band_px (int): Band height in pixels for the band by band renderer.
+    photo_processing_stats_jobs (int): Number of last jobs kept for the /stats command.
+    photo_processing_resample_main (str): Pillow filter for resizing the picture to the print size.
+    photo_processing_resample_strip (str): Pillow filter for stretching the wrap strips (Pillow wrap engine).
+    photo_processing_resample_corner (str): Pillow filter for stretching the wrap corners (Pillow wrap engine).
+        Filters from fastest to sharpest: NEAREST (blocky, only for tests), BILINEAR (about 2x faster than BICUBIC,
+        slightly soft, fine for banners), BICUBIC (default, balanced), LANCZOS (sharpest, about 1.5x slower
+        than BICUBIC, may ring on hard edges). BOX and HAMMING only make sense for downscaling.
+        The NumPy wrap engine always stretches linearly and ignores the strip and corner filters.
+    photo_processing_material_resample (dict[str, dict[str, str]]): Filter overrides per material,
+        for example {'Баннер': {'main': 'BILINEAR', 'strip': 'BILINEAR'}}.
+    photo_processing_prefetch (int): Number of queued photos downloaded ahead while the current one is handled.
+    photo_processing_prefetch_mb (int): Memory cap in MB for decoded photos waiting for download or render.
+    photo_processing_heif_threads (int): Number of threads libheif uses to decode one HEIC image.
+    photo_processing_max_image_mpx (int): Largest image in megapixels that is decoded (0 - no limit).
 
     cropper_qss (str): Path to the stylesheet used by the Cropper windows.
+    cropper_warm_start (bool): Start the Cropper process with the bot and keep a hidden Cropper window ready,
+        so it opens without building the UI.
+    cropper_auto_test_ms (int): Pause in ms after the crop frame stops before the print preview (Test)
+        is rendered by itself (0 - only on the Test button).
 
 Methods:
     save(): Saves current configuration to `sendy.data`.
@@ -72,6 +97,22 @@ class Data:
     photo_processing_font_path: str = "arial.ttf"
     photo_processing_font: str = "Arial"
     photo_processing_font_color: str = '#FF0000'
+    photo_processing_wrap_engine: str = 'pillow'
+    photo_processing_single_canvas: bool = True
+    photo_processing_workers: int = 0
+    photo_processing_icc_path: str = r"C:\Windows\System32\spool\drivers\color\sRGB Color Space Profile.icm"
+    photo_processing_material_icc: dict[str, str] = field(default_factory=dict)
+    photo_processing_streaming_mpx: int = 120
+    photo_processing_band_px: int = 512
+    photo_processing_stats_jobs: int = 100
+    photo_processing_resample_main: str = 'BICUBIC'
+    photo_processing_resample_strip: str = 'LANCZOS'
+    photo_processing_resample_corner: str = 'BICUBIC'
+    photo_processing_material_resample: dict[str, dict[str, str]] = field(default_factory=dict)
+    photo_processing_prefetch: int = 4
+    photo_processing_prefetch_mb: int = 1024
+    photo_processing_heif_threads: int = 4
+    photo_processing_max_image_mpx: int = 0
 
     photo_processing_annotation_canvas: str = ''
     photo_processing_annotation_banner: str = '_'
@@ -79,6 +120,8 @@ class Data:
     photo_processing_annotation_matte: str = '@'
 
     cropper_css: str = ':/cropper_bright.css'
+    cropper_warm_start: bool = True
+    cropper_auto_test_ms: int = 0
 
     def save(self):
         data_path = os.path.join(config.info.app_directory, 'sendy.data')
@@ -10,15 +10,23 @@ Main parts:
 - processed_photo_btns_handler() - handles buttons for opening, locating in folder, or deleting photos.
 - add_image_to_queue() - adds images to the user queue and starts processing.
 - _image_queue_worker() - processes all images for one user.
+- ImagePrefetcher - takes messages from a user queue in order and downloads the next ones in the background.
 - process_image_add_to_queue() - main image workflow: download, parse, crop, process, send result.
+- reply_in_order() - sends the result of a render once its file is saved, after the previous replies.
 - choose_size() - handles size selection from inline buttons.
 - any_message() - handles user text replies (used for waiting inputs).
 
 Notes:
 - Uses `asyncio` queues and locks per user to avoid conflicts.
-- Image handling with Pillow and pillow-heif.
-- Cropper runs in a separate thread via `sendy_cropper()`.
-- Processed results handled by `PhotoProc`.
+- Up to `data.photo_processing_prefetch` next photos are downloaded and decoded while the current one is handled,
+  decoded images waiting in memory are capped by `data.photo_processing_prefetch_mb`.
+- Images are decoded by `photo_processing.decoders` (Pillow and pillow-heif).
+- A decoded photo is copied once into shared memory (`SharedImage`), the Cropper process and the render workers
+  read it from there. The block is freed once the render is finished or the Cropper is closed.
+- Cropper runs in a companion process via `cropper_service`, its result is awaited without polling.
+- Processed results handled by `PhotoProc` in worker processes via `render_executor`.
+  The queue does not wait for the render: the next photo is handled while the previous one is rendered and saved.
+- Stage timings of every job (download, waiting, cropper, render stages, send) go to `stage_stats` for /stats.
 - Interactive flow managed via inline keyboards.
 """
 
@@ -28,20 +36,20 @@ import re
 import logging
 import os
 import subprocess
+from collections import deque
 from io import BytesIO
-from threading import Thread
 from pathlib import Path
-from queue import Queue
 
 from aiogram import F, Router
 from aiogram import Bot
 from aiogram.types import CallbackQuery, Message, InlineKeyboardButton
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from PIL import Image, ImageOps, UnidentifiedImageError
-import pillow_heif
 
-from cropper.cropper_main import sendy_cropper
-from photo_processing import PhotoProc
+from cropper.cropper_service import cropper_service
+from photo_processing import RenderJob, render_executor, JobRecord, stage_stats, SharedImage
+from photo_processing.orientation import exif_orientation, upright_size
+from photo_processing.decoders import decode
 from keyboards import photo_paths, manage_photo_inline_kb
 from lexicon import handlers_lex, processing_lex
 from config import config
@@ -55,6 +63,8 @@ user_message_text_futures: dict[int, asyncio.Future] = {}
 image_queue: dict[int, asyncio.Queue] = {}
 locks: dict[int, asyncio.Lock] = {}
 image_queue_tasks: dict[int, asyncio.Task[None]] = {}
+reply_chains: dict[int, asyncio.Task[None]] = {}
+prefetchers: dict[int, 'ImagePrefetcher'] = {}
 
 
 def parser(text: str) -> dict[str, list[str] | str | bool]:
@@ -202,18 +212,87 @@ async def download_image(file, bot: Bot):
         logger.exception('TimeoutError while downloading image')
         return None
 
-    pillow_heif.register_heif_opener()
     try:
+        # Decoding takes long for big photos, it runs in a thread so other downloads go on
         img_data.seek(0)
-        image = Image.open(img_data).convert("RGB")
-        image = ImageOps.exif_transpose(image)
-    except UnidentifiedImageError:
+        image = await asyncio.to_thread(decode, img_data)
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError):
         logger.exception('Corrupted image')
         return None
 
     return image
 
 
+async def fetch_image(message: Message, bot: Bot) -> Image.Image | None:
+    """Downloads and decodes the photo or image document of `message`, None if there is none."""
+    if not (message.photo or message.document):
+        return None
+
+    file_id = (message.photo[-1] if message.photo else message.document).file_id
+    file = await bot.get_file(file_id)
+    return await download_image(file, bot)
+
+
+def image_mb(image: Image.Image | None) -> float:
+    return image.width * image.height * len(image.getbands()) / 2 ** 20 if image else 0
+
+
+class ImagePrefetcher:
+    """Takes messages from a user queue in submission order and keeps downloading the images
+    of up to `data.photo_processing_prefetch` next messages while the current one is handled.
+
+    Decoded images held by the prefetcher and by unfinished renders are capped by
+    `data.photo_processing_prefetch_mb`: above it no new download starts and `render()` waits
+    for earlier renders to finish.
+    """
+
+    def __init__(self, queue: asyncio.Queue, bot: Bot):
+        self.queue = queue
+        self.bot = bot
+        self.prefetched: deque[tuple[Message, asyncio.Task]] = deque()
+        self.rendering: dict[asyncio.Future, float] = {}
+
+    def held_mb(self) -> float:
+        held = sum(self.rendering.values())
+        for _, task in self.prefetched:
+            if task.done() and not task.cancelled() and task.exception() is None:
+                held += image_mb(task.result())
+        return held
+
+    def fill(self) -> None:
+        while (len(self.prefetched) <= data.photo_processing_prefetch
+               and not self.queue.empty()
+               and self.held_mb() < data.photo_processing_prefetch_mb):
+            message = self.queue.get_nowait()
+            self.prefetched.append((message, asyncio.create_task(fetch_image(message, self.bot))))
+
+    def next(self) -> tuple[Message, asyncio.Task] | None:
+        """Returns the next message with its download task, None if the queue is empty."""
+        self.fill()
+        if not self.prefetched:
+            return None
+        return self.prefetched.popleft()
+
+    async def render(self, job: RenderJob, record: JobRecord) -> asyncio.Future:
+        """Starts rendering `job` once its image fits under the memory cap."""
+        if isinstance(job.image, SharedImage):
+            needed = job.image.nbytes / 2 ** 20
+        else:
+            needed = image_mb(job.image) if isinstance(job.image, Image.Image) else 0
+        while self.rendering and self.held_mb() + needed > data.photo_processing_prefetch_mb:
+            await asyncio.wait(list(self.rendering), return_when=asyncio.FIRST_COMPLETED)
+
+        render = asyncio.ensure_future(timed_render(job, record))
+        self.rendering[render] = needed
+        render.add_done_callback(lambda future: self.rendering.pop(future, None))
+        return render
+
+    def cancel(self) -> None:
+        for message, task in self.prefetched:
+            task.cancel()
+        self.prefetched.clear()
+
+
 async def send_result(path, no_material, number, message=None):
     try:
         text = (f'{handlers_lex['processing_image_saved']}\n'
@@ -236,127 +315,192 @@ async def send_result(path, no_material, number, message=None):
                                           )
 
 
-async def process_image_add_to_queue(user_id: int, bot: Bot):
-    while not image_queue[user_id].empty():
-        user_message = await image_queue[user_id].get()
-        reply_message = await user_message.reply(handlers_lex['processing_downloading'])
-        image = None
-
-        # Downloading
-        if user_message.photo or user_message.document:
-            file_id = (user_message.photo[-1] if user_message.photo else user_message.document).file_id
-            file = await bot.get_file(file_id)
-            image = await download_image(file, bot)
-
-        # Parsing
-        parsed = parser(user_message.caption or '%')
-        if not image and not parsed['cropper']:
-            await reply_message.edit_text(handlers_lex['processing_image_error'])
+async def timed_render(job: RenderJob, record: JobRecord) -> Path:
+    try:
+        with record.stage('render'):
+            return await render_executor.render(job, record)
+    finally:
+        if isinstance(job.image, SharedImage):
+            job.image.unlink()
+
+
+async def reply_in_order(user_id: int, render: asyncio.Future, previous: asyncio.Task | None,
+                         no_material, number, reply_message: Message, record: JobRecord) -> None:
+    """Waits for the previous reply of the user, then for `render`, and sends the result.
+    `render` completes only after the file is fully written under its final name."""
+    try:
+        if previous:
+            await previous
+            previous = None
+
+        try:
+            filepath: Path = await render
+        except Exception as e:
+            logger.exception('Error while rendering image')
+            await reply_message.edit_text(f"{handlers_lex['processing_error']} {e}")
             return
 
-        await reply_message.edit_text(random.choice(processing_lex))
+        with record.stage('send'):
+            await send_result(filepath, no_material, number, reply_message)
+        stage_stats.add(record)
+
+    except Exception:
+        logger.exception('Error while sending result')
+    finally:
+        if reply_chains.get(user_id) is asyncio.current_task():
+            del reply_chains[user_id]
 
-        width_height = parsed['sizes']
-        cropper = parsed['cropper']
 
-        # Waiting data from user
-        if not width_height and not cropper:
-            await reply_message.edit_text(handlers_lex['processing_waiting_data'])
+async def process_image_add_to_queue(user_id: int, bot: Bot):
+    prefetcher = prefetchers[user_id] = ImagePrefetcher(image_queue[user_id], bot)
+    try:
+        while item := prefetcher.next():
+            try:
+                await process_message(user_id, *item, prefetcher)
+            except Exception as e:
+                # One broken photo must not drop the prefetched ones after it
+                logger.exception('Error while processing image')
+                await reply_error(item[0], e)
+    finally:
+        prefetcher.cancel()
+        if prefetchers.get(user_id) is prefetcher:
+            del prefetchers[user_id]
+
+
+async def reply_error(user_message: Message, error: Exception) -> None:
+    try:
+        await user_message.reply(f"{handlers_lex['processing_error']} {error}")
+    except Exception:
+        logger.exception('Cannot send the error reply')
+
+
+async def process_message(user_id: int, user_message: Message, image_task: asyncio.Task,
+                          prefetcher: ImagePrefetcher):
+    reply_message = await user_message.reply(handlers_lex['processing_downloading'])
+    record = JobRecord()
+
+    # Downloading (started in the background by the prefetcher, usually done by now)
+    with record.stage('download'):
+        try:
+            image = await image_task
+        except Exception:
+            logger.exception('Error while downloading image')
+            image = None
+    # EXIF orientation is applied by `PhotoProc` to the resized result, the photo is not transposed here
+    orientation = exif_orientation(image) if image else 1
+    if image:
+        record.dimensions['download'] = image.size
+
+    # Parsing
+    parsed = parser(user_message.caption or '%')
+    if not image and not parsed['cropper']:
+        await reply_message.edit_text(handlers_lex['processing_image_error'])
+        return
+
+    await reply_message.edit_text(random.choice(processing_lex))
 
-            width_height_future = asyncio.get_event_loop().create_future()
-            user_message_text_futures[user_message.from_user.id] = width_height_future
+    width_height = parsed['sizes']
+    cropper = parsed['cropper']
 
+    # Waiting data from user
+    if not width_height and not cropper:
+        await reply_message.edit_text(handlers_lex['processing_waiting_data'])
+
+        width_height_future = asyncio.get_event_loop().create_future()
+        user_message_text_futures[user_message.from_user.id] = width_height_future
+
+        with record.stage('waiting'):
             new_caption = await width_height_future
-            parsed = parser(new_caption)
-            width_height = parsed['sizes']
-
-            if not width_height:
-                cropper = True
-
-        # Waiting for user to choose the size
-        elif len(width_height) > 1 and not cropper:
-            kb = InlineKeyboardBuilder()
-            for size in width_height:
-                kb.add(InlineKeyboardButton(
-                    text=size,
-                    callback_data=f"choose_size:{size}"
-                ))
-            kb.adjust(1)
-
-            await reply_message.edit_text(handlers_lex['processing_waiting_size'], reply_markup=kb.as_markup())
-
-            size_future = asyncio.get_event_loop().create_future()
-            user_choice_size_futures[user_message.from_user.id] = size_future
+        parsed = parser(new_caption)
+        width_height = parsed['sizes']
+
+        if not width_height:
+            cropper = True
+
+    # Waiting for user to choose the size
+    elif len(width_height) > 1 and not cropper:
+        kb = InlineKeyboardBuilder()
+        for size in width_height:
+            kb.add(InlineKeyboardButton(
+                text=size,
+                callback_data=f"choose_size:{size}"
+            ))
+        kb.adjust(1)
+
+        await reply_message.edit_text(handlers_lex['processing_waiting_size'], reply_markup=kb.as_markup())
+
+        size_future = asyncio.get_event_loop().create_future()
+        user_choice_size_futures[user_message.from_user.id] = size_future
+        with record.stage('waiting'):
             size = await size_future
-            width_height = [size]
-            del user_choice_size_futures[user_message.from_user.id]
+        width_height = [size]
+        del user_choice_size_futures[user_message.from_user.id]
 
-        number = parsed['number']
-        if not number:
-            number = ''  # Ø
+    number = parsed['number']
+    if not number:
+        number = ''  # Ø
 
-        material = parsed['material']
-        no_material = parsed['no_material']
+    material = parsed['material']
+    no_material = parsed['no_material']
 
-        if parsed['urgent']:
-            number += ' ‼'
+    if parsed['urgent']:
+        number += ' ‼'
 
-        processing = PhotoProc()
-        if width_height:
-            width_cm, height_cm = width_height[0].split('х')
-        else:
-            width_cm, height_cm = 0, 0
+    if width_height:
+        width_cm, height_cm = width_height[0].split('х')
+    else:
+        width_cm, height_cm = 0, 0
 
-        width_cm, height_cm = int(width_cm), int(height_cm)
+    width_cm, height_cm = int(width_cm), int(height_cm)
 
-        if image and image.size[0] > image.size[1] and width_cm < height_cm:
+    if image:
+        image_width, image_height = upright_size(image.size, orientation)
+        if image_width > image_height and width_cm < height_cm:
             width_cm, height_cm = height_cm, width_cm
 
-        # Waiting for Cropper to open
-        if cropper:
-            await reply_message.edit_text(handlers_lex['processing_waiting_for_cropper'])
-            cropper_queue = Queue()
-
-            def wrapper():
-                result = sendy_cropper(
-                    image=image,
-                    number=number,
-                    width=width_cm,
-                    height=height_cm,
-                    material=material
-                )
-                cropper_queue.put(result)
-
-            Thread(target=wrapper, daemon=True).start()
-            # Waiting for Cropper to return result
-            result = True
-            while result:
-                try:
-                    result = cropper_queue.get_nowait()
-                    number = result['number']
-                    no_material = False
-                    processing.presets(**result)
-                    break
-                except:
-                    await asyncio.sleep(3)
-            else:
-                # Deleting reply message if no result from Cropper (user closed Cropper)
-                await reply_message.delete()
-                return
-
-        else:
-            processing.presets(
-                image=image,
+    # Waiting for Cropper to open
+    if cropper:
+        await reply_message.edit_text(handlers_lex['processing_waiting_for_cropper'])
+        if image and orientation != 1:
+            image = ImageOps.exif_transpose(image)  # Cropper shows the pixels as they are
+        shared = await asyncio.to_thread(SharedImage.create, image) if image else None
+
+        # Waiting for Cropper to return result
+        with record.stage('cropper'):
+            result = await cropper_service.crop(
+                image=shared,
                 number=number,
-                width_cm=width_cm,
-                height_cm=height_cm,
+                width=width_cm,
+                height=height_cm,
                 material=material
             )
+        if shared and (not result or result['image'] != shared):
+            shared.unlink()  # Cropper closed, or another file was opened in it
+        if not result:
+            # Deleting reply message if no result from Cropper (user closed Cropper)
+            await reply_message.delete()
+            return
 
-        filepath: Path = processing.process_image()
+        number = result['number']
+        no_material = False
+        job = RenderJob(**result)
 
-        # Sending result to user chat
-        await send_result(filepath, no_material, number, reply_message)
+    else:
+        job = RenderJob(
+            image=await asyncio.to_thread(SharedImage.create, image),
+            number=number,
+            width_cm=width_cm,
+            height_cm=height_cm,
+            material=material,
+            orientation=orientation
+        )
+
+    # Rendering and saving go on in a worker process while the next photo is handled,
+    # the result is sent to user chat after the replies for the previous photos
+    render = await prefetcher.render(job, record)
+    reply_chains[user_id] = asyncio.create_task(
+        reply_in_order(user_id, render, reply_chains.get(user_id), no_material, number, reply_message, record)
+    )
 
 
 @image_processing_router.callback_query(F.data.startswith("choose_size:"))
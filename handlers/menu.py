@@ -7,6 +7,7 @@ Contains message handlers for bot's main menu:
 - /counter: counts images in folder (admin only)
 - /screenshoot: takes and sends screenshot (admin only)
 - /info, /help: shows info text
+- /stats: shows p50/p95 time per processing stage for the last jobs and the current queue depth
 - /stop: shows shutdown confirmation and stops the Sendy application (admin only)
 """
 
@@ -24,7 +25,8 @@ import pyautogui
 from lexicon import settings_lexicon, menu, MENU_COMMANDS
 from config import config
 from keyboards import main_kb, shutdown_inline_kb, settings_main_inline_kb
-from handlers.image_processing_handlers import add_image_to_queue
+from handlers.image_processing_handlers import add_image_to_queue, image_queue, prefetchers
+from photo_processing import stage_stats
 from data import data
 from image_counter.image_counter import count_images_in_folder
 
@@ -87,6 +89,26 @@ async def help_command(message: Message):
     await message.answer(menu['/info'])
 
 
+@menu_router.message(Command(commands=["stats"]))
+async def stats_command(message: Message):
+    summary = stage_stats.summary()
+    queue_depth = (sum(queue.qsize() for queue in image_queue.values())
+                   + sum(len(prefetcher.prefetched) for prefetcher in prefetchers.values()))
+
+    text = (f"{menu['/stats']}\n"
+            f"\n{menu['stats_jobs']} {len(stage_stats.records)}"
+            f"\n{menu['stats_queue']} {queue_depth}\n")
+    if summary:
+        text += '\n<code>'
+        text += '\n'.join(f'{stage:<13} p50 {stats.p50:6.2f}s  p95 {stats.p95:6.2f}s'
+                          for stage, stats in summary.items())
+        text += '</code>'
+    else:
+        text += f"\n{menu['stats_empty']}"
+
+    await message.answer(text)
+
+
 @menu_router.message(Command(commands=["stop"]))
 async def stop_command(message: Message):
     await message.answer(text=menu['/stop'],
@@ -48,6 +48,7 @@ from keyboards import (
     back_to_image_loader_inline_kb
 )
 from cropper import open_settings_app
+from photo_processing import clear_text_cache
 
 logger = logging.getLogger(__name__)
 settings_router = Router(name='settings_router')
@@ -170,6 +171,7 @@ async def receive_settings_photo_processing_value(message: Message, state: FSMCo
         if 1 <= float(value) <= 500:
             setattr(data, attr, ATTR_type[attr](value))
             data.save()
+            clear_text_cache()
             await state.clear()
             await message.answer(
                 text=settings_lexicon['setting_value_success'],
@@ -20,6 +20,7 @@ MENU_COMMANDS: dict[str, str] = {
     '/settings': 'настройки',
     '/cropper': 'открыть кроппер',
     '/info': 'о боте',
+    '/stats': 'статистика обработки',
     '/stop': 'остановить бота',
 }
 
@@ -39,7 +40,11 @@ menu: dict[str, str] = {
             @Andrey_David''',
     '/stop': 'Я устал, босс...',
     '/screenshoot': '✅ <b>Скриншот сохранен</b>',
-    'stop_sendy': 'Ты убил Сенди. 😭 Он прожил всего'
+    'stop_sendy': 'Ты убил Сенди. 😭 Он прожил всего',
+    '/stats': '📊 <b>Статистика обработки</b>',
+    'stats_jobs': 'Заданий:',
+    'stats_queue': 'В очереди:',
+    'stats_empty': '<i>Пока нет обработанных изображений</i>',
 }
 
 welcome_message: list[str] = [
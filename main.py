@@ -1,5 +1,6 @@
 import asyncio
 import logging
+import multiprocessing
 import os
 
 from aiogram import Bot, Dispatcher
@@ -23,6 +24,9 @@ from image_loader.image_loader import (
 )
 from startup import send_welcome_message
 from middlewares import IsAdminMiddleware
+from photo_processing import render_executor
+from cropper.cropper_service import cropper_service
+from data import data
 
 logger = logging.getLogger(__name__)
 
@@ -60,6 +64,9 @@ async def main() -> None:
         dp.update.outer_middleware(IsAdminMiddleware())
 
         _ = asyncio.create_task(image_loader())
+
+        if data.cropper_warm_start:
+            cropper_service.start()  # Qt and a Cropper window are ready before the first photo
     except Exception as e:
         logger.exception(f'Cannot run BOT: {e}')
 
@@ -82,10 +89,13 @@ async def main() -> None:
             if "Polling is not started" not in str(e):
                 raise
         await bot.session.close()
+        render_executor.shutdown()
+        cropper_service.shutdown()
         logger.info('BOT STOPPED')
 
 
 if __name__ == '__main__':
+    multiprocessing.freeze_support()  # render workers and the Cropper process in the frozen .exe
     try:
         asyncio.run(main())
     except Exception as e:
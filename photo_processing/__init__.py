@@ -1 +1,5 @@
-from .photo_processing import PhotoProc
\ No newline at end of file
+from .photo_processing import PhotoProc
+from .render_executor import RenderJob, render_executor
+from .text_cache import clear_text_cache
+from .stage_stats import JobRecord, stage_stats
+from .shared_image import SharedImage
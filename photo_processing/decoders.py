@@ -0,0 +1,87 @@
+"""Decoders
+
+One place to open images in Sendy: registers the extra formats once and decodes JPEG, PNG and HEIC
+from a path or bytes, in full or straight at preview size.
+
+Main parts:
+------------
+- register_decoders(): registers the HEIF opener with `data.photo_processing_heif_threads` decode threads
+  and sets the pixel limit from `data.photo_processing_max_image_mpx`. Runs once per process.
+- decode(): checks the header, decodes the image and returns it in RGB.
+
+Usage:
+    from photo_processing.decoders import decode
+
+    image = decode(path)  # full size
+    preview = decode(message_bytes, max_side=1600)  # at most 1600 px on the longest side
+
+Notes:
+- With `max_side`, JPEGs are decoded with DCT scaling (`Image.draft`) at the smallest scale that is still
+  at least `max_side`, and HEIC files use an embedded thumbnail if one is big enough. 48 MP is never decoded in full.
+- EXIF orientation is kept as stored, see `orientation`.
+"""
+
+import logging
+import math
+from functools import lru_cache
+from io import BytesIO
+from pathlib import Path
+
+import pillow_heif
+from PIL import Image, UnidentifiedImageError
+
+from data import data
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=1)
+def register_decoders() -> None:
+    pillow_heif.register_heif_opener(decode_threads=data.photo_processing_heif_threads or 1, thumbnails=True)
+
+    max_mpx = data.photo_processing_max_image_mpx
+    Image.MAX_IMAGE_PIXELS = max_mpx * 1_000_000 if max_mpx else None
+    logger.debug(f'Decoders registered, HEIF threads: {data.photo_processing_heif_threads}, limit: {max_mpx} MP')
+
+
+def heif_thumbnail(source, max_side: int) -> Image.Image | None:
+    """Smallest embedded thumbnail of a HEIC file that is at least `max_side` on its longest side."""
+    if hasattr(source, 'seek'):
+        source.seek(0)
+    heif = pillow_heif.open_heif(source)
+    primary = heif[heif.primary_index]
+
+    best = None
+    for index in range(len(primary.info['thumbnails'])):
+        thumbnail = primary.get_thumbnail(index)
+        if max(thumbnail.size) >= max_side and (best is None or max(thumbnail.size) < max(best.size)):
+            best = thumbnail
+    return best.to_pillow() if best else None
+
+
+def decode(source: str | Path | bytes | BytesIO, max_side: int | None = None) -> Image.Image:
+    """Decodes an image from a path, bytes or a file object. With `max_side`, the result fits into
+    `max_side` x `max_side` and is decoded at reduced size where the format allows it.
+
+    Raises `UnidentifiedImageError` for broken files before any pixel data is decoded."""
+    register_decoders()
+    if isinstance(source, bytes):
+        source = BytesIO(source)
+
+    image = Image.open(source)  # Reads the header only
+    if not image.width or not image.height:
+        raise UnidentifiedImageError('Image has no size')
+
+    if max_side and max(image.size) > max_side:
+        if image.format == 'JPEG':
+            scale = max_side / max(image.size)
+            image.draft('RGB', (math.ceil(image.width * scale), math.ceil(image.height * scale)))
+        elif image.format == 'HEIF':
+            image = heif_thumbnail(source, max_side) or image
+        image.thumbnail((max_side, max_side))
+    else:
+        image.load()
+
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    return image
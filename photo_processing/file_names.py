@@ -0,0 +1,107 @@
+"""File Names
+
+Allocates unique output file names ("name.jpg", "name (2).jpg", "name (3).jpg", ...) for `PhotoProc`.
+
+The first allocation in a directory scans it once and remembers the highest counter used for every
+name, later allocations take the next counter from memory instead of probing the disk name by name.
+A finished file is published under its name with an atomic exclusive rename, so concurrent renders
+(other worker processes, files copied in by hand) never get the same name: if the name already exists,
+the next counter is tried. Until then the file lives under a temporary name, so a crash never leaves
+a truncated photo under a final name.
+
+Main parts:
+------------
+- NameAllocator: per-directory index of used counters.
+  - publish(): moves a written temp file to the first free name and returns the new path.
+- name_allocator: process-wide instance.
+
+Notes:
+- The index is only a hint, the exclusive rename is what makes names unique. Files deleted after the scan
+  are not reused, so numbering may have gaps, but it never repeats.
+- On POSIX the rename is a hard link. Where the file system has no hard links, the name is reserved with
+  an exclusively created empty file that the photo then replaces.
+"""
+
+import errno
+import logging
+import os
+import re
+import threading
+
+logger = logging.getLogger(__name__)
+
+COUNTER_PATTERN = re.compile(r'^(?P<base>.*?)(?: \((?P<counter>\d+)\))?$')
+NO_HARD_LINKS = {errno.EPERM, errno.ENOTSUP, errno.EXDEV}  # File systems without hard links (FAT, exFAT, SMB shares)
+
+
+def move_exclusive(source: str, target: str) -> None:
+    """Atomically renames `source` to `target`, raises `FileExistsError` instead of replacing an existing file."""
+    if os.name == 'nt':
+        os.rename(source, target)  # Never replaces on Windows
+        return
+
+    try:
+        os.link(source, target)
+    except FileExistsError:
+        raise
+    except OSError as e:
+        if not isinstance(e, PermissionError) and e.errno not in NO_HARD_LINKS:
+            raise
+        # Reserve the name with an empty file, then replace it: only the reservation has to be exclusive
+        os.close(os.open(target, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        try:
+            os.replace(source, target)
+        except OSError:
+            os.remove(target)
+            raise
+    else:
+        os.remove(source)
+
+
+class NameAllocator:
+    def __init__(self):
+        self._next: dict[str, dict[str, int]] = {}  # directory -> name -> next free counter
+        self._lock = threading.Lock()
+
+    def _index(self, directory: str) -> dict[str, int]:
+        key = os.path.normcase(os.path.abspath(directory))
+        index = self._next.get(key)
+        if index is None:
+            index = {}
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    name, counter = self._split(entry.name)
+                    index[name] = max(index.get(name, 1), counter + 1)
+            self._next[key] = index
+            logger.debug(f'Indexed {len(index)} names in {directory}')
+        return index
+
+    @staticmethod
+    def _split(filename: str) -> tuple[str, int]:
+        stem, ext = os.path.splitext(filename)
+        match = COUNTER_PATTERN.match(stem)
+        counter = int(match['counter']) if match['counter'] else 1
+        return os.path.normcase(match['base'] + ext), counter
+
+    def publish(self, source: str, directory: str, filename: str) -> str:
+        """Moves `source` to `filename` in `directory`, or to the first free "name (N)" after the used ones."""
+        stem, ext = os.path.splitext(filename)
+        with self._lock:
+            index = self._index(directory)
+            name = os.path.normcase(filename)
+            counter = index.get(name, 1)
+
+            while True:
+                candidate = filename if counter == 1 else f"{stem} ({counter}){ext}"
+                path = os.path.join(directory, candidate)
+                try:
+                    move_exclusive(source, path)
+                except FileExistsError:
+                    counter += 1
+                    continue
+
+                index[name] = counter + 1
+                return path
+
+
+name_allocator = NameAllocator()
@@ -0,0 +1,70 @@
+"""ICC Profiles
+
+Provides ICC profiles for `PhotoProc` and loads every profile at most once per process.
+
+Images without an embedded profile get the default profile from `data.photo_processing_icc_path`
+(the Windows sRGB profile by default). If that file does not exist, for example on a Linux
+render machine, a built-in sRGB profile generated by LittleCMS is used instead.
+
+Materials may also have their own output profile (`data.photo_processing_material_icc`),
+in which case the rendered image is converted to it before saving.
+
+Main parts:
+------------
+- default_profile(): profile for images without an embedded one.
+- output_profile(): configured output profile for a material, or None.
+- convert_to_profile(): converts an image in place between two profiles (transforms are cached).
+"""
+
+import logging
+from functools import lru_cache
+from io import BytesIO
+
+from PIL import Image, ImageCms
+
+from data import data
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=None)
+def load_profile(path: str) -> bytes | None:
+    try:
+        with open(path, "rb") as icc_profile:
+            return icc_profile.read()
+    except OSError:
+        logger.warning(f'ICC profile not found: {path}')
+        return None
+
+
+@lru_cache(maxsize=1)
+def builtin_srgb() -> bytes:
+    return ImageCms.ImageCmsProfile(ImageCms.createProfile("sRGB")).tobytes()
+
+
+def default_profile() -> bytes:
+    return load_profile(str(data.photo_processing_icc_path)) or builtin_srgb()
+
+
+def output_profile(material: str) -> bytes | None:
+    path = data.photo_processing_material_icc.get(material)
+    if not path:
+        return None
+    return load_profile(str(path))
+
+
+@lru_cache(maxsize=8)
+def _transform(source: bytes, target: bytes) -> ImageCms.ImageCmsTransform:
+    return ImageCms.buildTransform(
+        ImageCms.ImageCmsProfile(BytesIO(source)),
+        ImageCms.ImageCmsProfile(BytesIO(target)),
+        "RGB",
+        "RGB"
+    )
+
+
+def convert_to_profile(image: Image.Image, source: bytes, target: bytes) -> None:
+    """Converts an RGB `image` from `source` to `target` profile in place."""
+    if source == target:
+        return
+    ImageCms.applyTransform(image, _transform(source, target), inPlace=True)
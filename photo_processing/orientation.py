@@ -0,0 +1,67 @@
+"""Orientation
+
+EXIF orientation support without transposing the full source image.
+
+Phone photos are often stored sideways with an EXIF orientation tag. Instead of turning the whole
+decoded photo upright first (a full copy), `PhotoProc` keeps the stored pixels, maps the crop box
+from upright coordinates to stored ones and transposes only the resized result.
+
+Main parts:
+------------
+- exif_orientation(): orientation tag of an image (1 if there is none).
+- upright_size(): size of a stored image once it is turned upright.
+- source_box(): maps a box in upright coordinates to the stored image.
+- TRANSPOSE: transpose method that turns the stored pixels upright, per orientation.
+- SWAPS_AXES: orientations stored with width and height swapped.
+- rotation_orientation(): orientation that turns an image by a multiple of 90 degrees, like `Image.rotate()`.
+"""
+
+from PIL import ExifTags, Image
+
+TRANSPOSE: dict[int, Image.Transpose] = {
+    2: Image.Transpose.FLIP_LEFT_RIGHT,
+    3: Image.Transpose.ROTATE_180,
+    4: Image.Transpose.FLIP_TOP_BOTTOM,
+    5: Image.Transpose.TRANSPOSE,
+    6: Image.Transpose.ROTATE_270,
+    7: Image.Transpose.TRANSVERSE,
+    8: Image.Transpose.ROTATE_90,
+}
+
+SWAPS_AXES = {5, 6, 7, 8}
+
+
+def rotation_orientation(angle: int) -> int:
+    """Orientation equal to `image.rotate(angle, expand=True)` for a multiple of 90 degrees (counterclockwise)."""
+    return {0: 1, 90: 8, 180: 3, 270: 6}[angle % 360]
+
+
+def exif_orientation(image: Image.Image) -> int:
+    orientation = image.getexif().get(ExifTags.Base.Orientation, 1)
+    return orientation if orientation in TRANSPOSE else 1
+
+
+def upright_size(size: tuple[int, int], orientation: int) -> tuple[int, int]:
+    return (size[1], size[0]) if orientation in SWAPS_AXES else size
+
+
+def source_box(box, size: tuple[int, int], orientation: int) -> tuple:
+    """Maps `box` given in upright coordinates to the image stored with `size` and `orientation`."""
+    left, top, right, bottom = box
+    width, height = upright_size(size, orientation)
+
+    if orientation == 2:
+        return width - right, top, width - left, bottom
+    if orientation == 3:
+        return width - right, height - bottom, width - left, height - top
+    if orientation == 4:
+        return left, height - bottom, right, height - top
+    if orientation == 5:
+        return top, left, bottom, right
+    if orientation == 6:
+        return top, width - right, bottom, width - left
+    if orientation == 7:
+        return height - bottom, width - right, height - top, width - left
+    if orientation == 8:
+        return height - bottom, left, height - top, right
+    return left, top, right, bottom
@@ -8,21 +8,42 @@ Main parts:
 ------------
 - PhotoProc: main class that manages the full image processing pipeline.
   - presets(): initializes image parameters (size, material, coordinates, etc.).
-  - stretch(): extends image edges for gallery wrap effect.
+  - draft(): switches to a fast preview rendered from a downscaled proxy of the source.
+  - crop_resize(): resamples the selected area straight to the print size (fused crop and resize).
+  - resample(): resamples a box of the source, applying EXIF orientation to the result only (see `orientation`).
+  - padded(): renders a box that may leave the source, the outside is black as with `Image.crop()`.
+  - resampling(): resampling filter for the picture, wrap strips or corners (configurable per material).
+  - stretch(): extends image edges for gallery wrap effect (Pillow or NumPy engine, see `wrap_engine`).
   - white_frame(): adds white margins to reach the target print size.
+  - compose(): draws the wrap and white margins into one canvas allocated once (single canvas mode).
   - black_frame(): draws a black outline border around the final image.
-  - add_number(): overlays order or print number on the top and bottom edges.
-  - save_image(): saves the final image with ICC profile and unique filename.
+  - add_number(): overlays order or print number on the top and bottom edges (cached, see `text_cache`).
+  - save_image(): saves the final image with ICC profile (see `icc_profiles`) and unique filename (see `file_names`).
+  - write_jpeg(): encodes into a temp file and publishes it atomically once it is on disk.
+  - stream_image(): renders and saves oversized prints band by band with bounded memory.
   - process_image(): executes the complete processing pipeline and returns the saved file path.
+  - process_many(): renders a batch of jobs on all cores (see `render_executor`).
+
+Notes:
+- Every stage records its time and the image size after it into `timings` and `dimensions` (see `stage_stats`).
 """
 
+import math
 import os
 import logging
+import tempfile
 from pathlib import Path
 
-from PIL import Image, ImageDraw, ImageFont, ImageFilter
+import numpy as np
+from PIL import Image, ImageDraw, ImageFilter
 
 from data import data
+from photo_processing.wrap_engine import stretch_array, wrap_tiles
+from photo_processing.text_cache import number_stamp
+from photo_processing.icc_profiles import default_profile, output_profile, convert_to_profile
+from photo_processing.stage_stats import stage_timer, timed_stage
+from photo_processing.file_names import name_allocator
+from photo_processing.orientation import TRANSPOSE, SWAPS_AXES, source_box, upright_size
 
 logger = logging.getLogger(__name__)
 
@@ -35,6 +56,7 @@ class PhotoProc:
         self.height_cm: int = 0
         self.material: str = 'Холст'
         self.coordinates: tuple[int, int, int, int] = (0, 0, 0, 0)
+        self.orientation: int = 1  # EXIF orientation of the source, `coordinates` are always upright
 
         self.wrap_cm: float = data.photo_processing_wrap_cm
         self.white_cm: float = data.photo_processing_white_cm
@@ -43,6 +65,9 @@ class PhotoProc:
         self.crop_px: int = data.photo_processing_crop_px
         self.font_path: str = data.photo_processing_font_path
         self.dpi: int = data.photo_processing_dpi
+        self.strip_px: int = data.photo_processing_strip_length_px
+        self.blur_px: float = data.photo_processing_blur_px
+        self.number_offset_px: int = 10
         self.icc: bytes | None = None
 
         self.CM_TO_INCH: float = 2.54
@@ -50,6 +75,10 @@ class PhotoProc:
 
         self.filepath = None
 
+        self.timings: dict[str, float] = {}  # Seconds per stage, see `stage_stats`
+        self.dimensions: dict[str, tuple[int, int]] = {}  # Image size after each stage
+        self._stage_children: list[float] = [0.0]
+
     def presets(
             self,
             image,
@@ -57,14 +86,13 @@ class PhotoProc:
             width_cm=0,
             height_cm=0,
             material='Холст',
-            coordinates=None
+            coordinates=None,
+            orientation=1
     ):
         self.image = image
-        self.icc = self.image.info.get("icc_profile")
-        if self.icc is None:
-            with open(r"C:\Windows\System32\spool\drivers\color\sRGB Color Space Profile.icm", "rb") as icc_profile:
-                self.icc = icc_profile.read()
-        image_width, image_height = self.image.size
+        self.orientation = orientation
+        self.icc = self.image.info.get("icc_profile") or default_profile()
+        image_width, image_height = upright_size(self.image.size, orientation)
 
         if coordinates:
             self.coordinates = coordinates
@@ -83,79 +111,145 @@ class PhotoProc:
     def set_dpi(self, value):
         self.dpi = value
 
-    def stretch(self):
+    def resampling(self, kind):
+        """Pillow filter for 'main', 'strip' or 'corner' resampling. Material overrides come first (see `Data`)."""
+        name = (data.photo_processing_material_resample.get(self.material, {}).get(kind)
+                or getattr(data, f'photo_processing_resample_{kind}'))
+        try:
+            return Image.Resampling[name.upper()]
+        except KeyError:
+            logger.warning(f'Unknown resampling filter: {name}, BICUBIC is used')
+            return Image.Resampling.BICUBIC
+
+    def draft(self, max_side):
+        """Draft mode: the result is rendered from a downscaled proxy of the source, about `max_side` pixels
+        on its longest side. Every pixel parameter is scaled by the same factor, so the layout matches the print."""
+        scale = max_side / max(self.canvas_size())
+        if scale >= 1:
+            return
+
+        self.dpi *= scale
+        self.black_px = max(1, round(self.black_px * scale)) if self.black_px else 0
+        self.strip_px = max(1, round(self.strip_px * scale))
+        self.blur_px *= scale
+        self.number_offset_px = round(self.number_offset_px * scale)
+
+        # Box-average the crop region down to about the preview size, the final resize only has to finish the job
+        left, top, right, bottom = self.coordinates
+        factor = int(min((right - left) / self.cm_to_px(self.width_cm), (bottom - top) / self.cm_to_px(self.height_cm)))
+        if factor > 1:
+            def reduced(size, box):
+                stored_box = tuple(round(value) for value in source_box(box, self.image.size, self.orientation))
+                region = self.image.reduce(factor, box=stored_box)
+                return region.transpose(TRANSPOSE[self.orientation]) if self.orientation in TRANSPOSE else region
+
+            size = (math.ceil((right - left) / factor), math.ceil((bottom - top) / factor))
+            self.image = self.padded(size, self.coordinates, reduced)
+            self.orientation = 1
+            self.coordinates = (0, 0) + self.image.size
+
+    def padded(self, size, box, render):
+        """Renders `box` of the source (upright coordinates) to `size` with `render(size, box)`.
+
+        The Cropper frame may be larger than the photo, so `box` may leave the source. Pillow only resamples
+        boxes inside the image: `render` gets the part of `box` inside the source, and its result is pasted
+        at the matching offset on a black canvas of `size`, as `Image.crop()` pads."""
+        left, top, right, bottom = box
+        width, height = upright_size(self.image.size, self.orientation)
+        inside = (max(left, 0), max(top, 0), min(right, width), min(bottom, height))
+        if inside == tuple(box):
+            return render(size, box)
+
+        scale_x, scale_y = size[0] / (right - left), size[1] / (bottom - top)
+        x0, y0 = round((inside[0] - left) * scale_x), round((inside[1] - top) * scale_y)
+        x1, y1 = round((inside[2] - left) * scale_x), round((inside[3] - top) * scale_y)
+
+        canvas = Image.new(self.image.mode, size)
+        if x0 < x1 and y0 < y1:
+            canvas.paste(render((x1 - x0, y1 - y0), inside), (x0, y0))
+        return canvas
+
+    def resample(self, size, box):
+        """Resamples `box` of the source (upright coordinates) to `size`, see `padded()` for boxes outside it.
+        EXIF orientation is applied to the resampled result only, the source is never transposed."""
+        return self.padded(size, box, self._resample)
+
+    def _resample(self, size, box):
+        if self.orientation not in TRANSPOSE:
+            return self.image.resize(size, self.resampling('main'), box=box)
+
+        stored_size = size[::-1] if self.orientation in SWAPS_AXES else size
+        region = self.image.resize(stored_size, self.resampling('main'),
+                                   box=source_box(box, self.image.size, self.orientation))
+        return region.transpose(TRANSPOSE[self.orientation])
+
+    @timed_stage
+    def stretch(self, canvas=None, offset=(0, 0)):
+        """Adds the gallery wrap. If `canvas` is given, the result is drawn into it at `offset`."""
+        if data.photo_processing_wrap_engine == 'numpy':
+            self.image = stretch_array(self.image,
+                                       self.cm_to_px(self.wrap_cm),
+                                       self.strip_px,
+                                       self.blur_px,
+                                       canvas=canvas,
+                                       offset=offset)
+        else:
+            self.stretch_pillow(canvas, offset)
+
+    def stretch_pillow(self, canvas=None, offset=(0, 0)):
         image_width, image_height = self.image.size
         wrap_px = self.cm_to_px(self.wrap_cm)
-        strip_crop_px = data.photo_processing_strip_length_px
-        corner_crop_px = data.photo_processing_strip_length_px
-        blur_px = data.photo_processing_blur_px
-
-        def stretched_strip(crop_box, strip_position):
-            position = {
-                'left': (wrap_px, image_height),
-                'right': (wrap_px, image_height),
-                'top': (image_width, wrap_px),
-                'bottom': (image_width, wrap_px),
-            }
-
-            strip = self.image.crop(crop_box)
-            if strip_position == 'left' or strip_position == 'right':
-                strip = strip.resize(position[strip_position], Image.LANCZOS)
-            elif strip_position == 'top' or strip_position == 'bottom':
-                strip = strip.resize(position[strip_position], Image.LANCZOS)
-
-            strip = strip.filter(ImageFilter.GaussianBlur(radius=blur_px))
-            return strip
-
-        left_strip = stretched_strip((0, 0, strip_crop_px, image_height), 'left')
-        right_strip = stretched_strip((image_width - strip_crop_px, 0, image_width, image_height), 'right')
-        top_strip = stretched_strip((0, 0, image_width, strip_crop_px), 'top')
-        bottom_strip = stretched_strip((0, image_height - strip_crop_px, image_width, image_height), 'bottom')
-
-        left_wrap = left_strip.crop((wrap_px - wrap_px, 0, wrap_px, image_height)).transpose(Image.FLIP_LEFT_RIGHT)
-        right_wrap = right_strip.crop((0, 0, wrap_px, image_height)).transpose(Image.FLIP_LEFT_RIGHT)
-        top_wrap = top_strip.crop((0, wrap_px - wrap_px, image_width, wrap_px)).transpose(Image.FLIP_TOP_BOTTOM)
-        bottom_wrap = bottom_strip.crop((0, 0, image_width, wrap_px)).transpose(Image.FLIP_TOP_BOTTOM)
-
-        corner_top_left = self.image.crop((corner_crop_px, corner_crop_px, corner_crop_px * 2, corner_crop_px * 2))
-        corner_top_right = self.image.crop(
-            (image_width - corner_crop_px * 2, corner_crop_px, image_width - corner_crop_px, corner_crop_px * 2))
-        corner_bottom_left = self.image.crop(
-            (corner_crop_px, image_height - corner_crop_px * 2, corner_crop_px * 2, image_height - corner_crop_px))
-        corner_bottom_right = self.image.crop(
-            (image_width - corner_crop_px * 2, image_height - corner_crop_px * 2, image_width - corner_crop_px,
-             image_height - corner_crop_px))
-
-        corner_top_left = corner_top_left.resize((wrap_px, wrap_px)).crop((0, 0, wrap_px, wrap_px))
-        corner_top_right = corner_top_right.resize((wrap_px, wrap_px)).crop((wrap_px - wrap_px, 0, wrap_px, wrap_px))
-        corner_bottom_left = corner_bottom_left.resize((wrap_px, wrap_px)).crop(
-            (0, wrap_px - wrap_px, wrap_px, wrap_px))
-        corner_bottom_right = corner_bottom_right.resize((wrap_px, wrap_px)).crop(
-            (wrap_px - wrap_px, wrap_px - wrap_px, wrap_px, wrap_px))
-
-        corner_top_left = corner_top_left.filter(ImageFilter.GaussianBlur(radius=blur_px))
-        corner_top_right = corner_top_right.filter(ImageFilter.GaussianBlur(radius=blur_px))
-        corner_bottom_left = corner_bottom_left.filter(ImageFilter.GaussianBlur(radius=blur_px))
-        corner_bottom_right = corner_bottom_right.filter(ImageFilter.GaussianBlur(radius=blur_px))
-
-        new_image = Image.new("RGB", (image_width + 2 * wrap_px, image_height + 2 * wrap_px))
-
-        new_image.paste(self.image, (wrap_px, wrap_px))
-        new_image.paste(left_wrap, (0, wrap_px))
-        new_image.paste(right_wrap, (image_width + wrap_px, wrap_px))
-        new_image.paste(top_wrap, (wrap_px, 0))
-        new_image.paste(bottom_wrap, (wrap_px, image_height + wrap_px))
-
-        new_image.paste(corner_top_left, (0, 0))
-        new_image.paste(corner_top_right, (image_width + wrap_px, 0))
-        new_image.paste(corner_bottom_left, (0, image_height + wrap_px))
-        new_image.paste(corner_bottom_right, (image_width + wrap_px, image_height + wrap_px))
+
+        if canvas is None:
+            new_image = Image.new("RGB", (image_width + 2 * wrap_px, image_height + 2 * wrap_px))
+        else:
+            new_image = canvas
+        x, y = offset
+
+        new_image.paste(self.image, (x + wrap_px, y + wrap_px))
+        for (tile_x, tile_y), tile in self.wrap_tiles_pillow(self.image.crop, image_width, image_height).items():
+            new_image.paste(tile, (x + tile_x, y + tile_y))
 
         self.image = new_image
 
-    def white_frame(self):
+    def wrap_tiles_pillow(self, region, image_width, image_height):
+        """Builds the eight wrap tiles with Pillow, positioned like `wrap_tiles()` of the NumPy engine.
+        `region(box)` returns the pixels of a box of the picture, only thin strips and corner squares are read."""
+        wrap_px = self.cm_to_px(self.wrap_cm)
+        strip_crop_px = self.strip_px
+        corner_crop_px = self.strip_px
+        blur_px = self.blur_px
+        strip_resample = self.resampling('strip')
+        corner_resample = self.resampling('corner')
+
+        def stretched_strip(crop_box, size, flip):
+            strip = region(crop_box).resize(size, strip_resample)
+            return strip.filter(ImageFilter.GaussianBlur(radius=blur_px)).transpose(flip)
+
+        def stretched_corner(left, top):
+            corner = region((left, top, left + corner_crop_px, top + corner_crop_px))
+            corner = corner.resize((wrap_px, wrap_px), corner_resample)
+            return corner.filter(ImageFilter.GaussianBlur(radius=blur_px))
+
+        vertical, horizontal = (wrap_px, image_height), (image_width, wrap_px)
+        return {
+            (0, wrap_px): stretched_strip((0, 0, strip_crop_px, image_height), vertical, Image.FLIP_LEFT_RIGHT),
+            (image_width + wrap_px, wrap_px): stretched_strip(
+                (image_width - strip_crop_px, 0, image_width, image_height), vertical, Image.FLIP_LEFT_RIGHT),
+            (wrap_px, 0): stretched_strip((0, 0, image_width, strip_crop_px), horizontal, Image.FLIP_TOP_BOTTOM),
+            (wrap_px, image_height + wrap_px): stretched_strip(
+                (0, image_height - strip_crop_px, image_width, image_height), horizontal, Image.FLIP_TOP_BOTTOM),
+
+            (0, 0): stretched_corner(corner_crop_px, corner_crop_px),
+            (image_width + wrap_px, 0): stretched_corner(image_width - corner_crop_px * 2, corner_crop_px),
+            (0, image_height + wrap_px): stretched_corner(corner_crop_px, image_height - corner_crop_px * 2),
+            (image_width + wrap_px, image_height + wrap_px): stretched_corner(image_width - corner_crop_px * 2,
+                                                                              image_height - corner_crop_px * 2),
+        }
+
+    def white_margins(self, image_width, image_height):
+        """Returns (left, top, right, bottom) white margins that bring an image with wrap to the target size."""
         white_px = self.cm_to_px(self.white_cm)
-        image_width, image_height = self.image.size
 
         target_width = round((self.width_cm + 2 * self.wrap_cm + 2 * self.white_cm) * self.dpi / self.CM_TO_INCH)
         target_height = round((self.height_cm + 2 * self.wrap_cm + 2 * self.white_cm) * self.dpi / self.CM_TO_INCH)
@@ -179,6 +273,13 @@ class PhotoProc:
             white_top = white_px
             white_bottom = white_px
 
+        return white_left, white_top, white_right, white_bottom
+
+    @timed_stage
+    def white_frame(self):
+        image_width, image_height = self.image.size
+        white_left, white_top, white_right, white_bottom = self.white_margins(image_width, image_height)
+
         canvas_width = image_width + white_left + white_right
         canvas_height = image_height + white_top + white_bottom
         canvas = Image.new("RGB", (canvas_width, canvas_height), color="white")
@@ -186,37 +287,44 @@ class PhotoProc:
 
         self.image = canvas
 
-    def add_number(self):
-        canvas = self.image
-        white_px = self.cm_to_px(self.white_cm)
+    @timed_stage
+    def compose(self):
+        """Computes the final geometry up front, allocates the output canvas once
+        and draws the wrap and the white frame straight into it."""
+        wrap_px = self.cm_to_px(self.wrap_cm)
+        image_width, image_height = self.image.size
+        wrapped_width = image_width + 2 * wrap_px
+        wrapped_height = image_height + 2 * wrap_px
+        white_left, white_top, white_right, white_bottom = self.white_margins(wrapped_width, wrapped_height)
 
-        draw = ImageDraw.Draw(canvas)
+        canvas = Image.new("RGB",
+                           (wrapped_width + white_left + white_right, wrapped_height + white_top + white_bottom),
+                           color="white")
+        self.stretch(canvas=canvas, offset=(white_left, white_top))
 
-        px = (self.text_px / 72) * self.dpi
+    def number_positions(self, canvas_width, canvas_height, stamp):
+        white_px = self.cm_to_px(self.white_cm)
+        x = (canvas_width - stamp.width) // 2
 
-        try:
-            font = ImageFont.truetype(self.font_path, px)
-        except Exception:
-            logger.exception('Font not found')
-            font = ImageFont.load_default()
+        top = (white_px + self.black_px) // 2 - stamp.height // 2 - self.number_offset_px
+        bottom = canvas_height - self.black_px - stamp.height * 2 + self.number_offset_px
+        return [(x, top), (x, bottom)]
+
+    @timed_stage
+    def add_number(self):
+        canvas = self.image
 
         if self.number:
-            bbox = draw.textbbox((0, 0), self.number, font=font)
-            text_width = bbox[2] - bbox[0]
-            text_height = bbox[3] - bbox[1]
+            stamp = number_stamp(self.number, self.font_path, self.text_px, self.dpi)
             text_color = data.photo_processing_font_color
 
-            # top number
-            x = (canvas.width - text_width) // 2
-            y = (white_px + self.black_px) // 2 - text_height // 2 - 10
-            draw.text((x, y), self.number, font=font, fill=text_color, stroke_width=5, stroke_fill="white")
-
-            # bottom number
-            y = canvas.height - self.black_px - text_height * 2 + 10
-            draw.text((x, y), self.number, font=font, fill=text_color, stroke_width=5, stroke_fill="white")
+            # top and bottom numbers
+            for x, y in self.number_positions(canvas.width, canvas.height, stamp):
+                stamp.paste(canvas, (x, y), text_color)
 
             self.image = canvas
 
+    @timed_stage
     def black_frame(self):
         canvas = self.image
 
@@ -228,7 +336,8 @@ class PhotoProc:
 
         self.image = canvas
 
-    def save_image(self):
+    def output_name(self):
+        """Returns the material directory and the file name of the print (before deduplication)."""
         os.makedirs(data.photo_processing_path, exist_ok=True)
         material_dir = os.path.join(data.photo_processing_path, self.material)
         os.makedirs(material_dir, exist_ok=True)
@@ -248,44 +357,171 @@ class PhotoProc:
 
         filename += f" {self.material}.jpg"
 
-        def unique_filename(directory, base_filename):
-            base, ext = os.path.splitext(base_filename)
-            counter = 2
-            new_filename = base_filename
+        return material_dir, filename
 
-            while os.path.exists(os.path.join(directory, new_filename)):
-                new_filename = f"{base} ({counter}){ext}"
-                counter += 1
-
-            return new_filename
+    def write_jpeg(self, image):
+        """Encodes `image` into a temp file next to the target and flushes it to disk, then publishes it
+        under a unique name with an atomic rename. A crash mid-write leaves only the temp file behind."""
+        directory, filename = self.output_name()
+        fd, temp_path = tempfile.mkstemp(prefix=f'.{filename}.', suffix='.tmp', dir=directory)
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                image.save(file, "JPEG", quality=100, dpi=(self.dpi, self.dpi), icc_profile=self.icc)
+                file.flush()
+                os.fsync(file.fileno())
+            self.filepath = name_allocator.publish(temp_path, directory, filename)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        logger.info(f"File saved: {self.filepath}")
 
-        filename = unique_filename(material_dir, filename)
-        self.filepath = os.path.join(material_dir, filename)
+    @timed_stage
+    def save_image(self):
+        icc = output_profile(self.material)
+        if icc:
+            convert_to_profile(self.image, self.icc, icc)
+            self.icc = icc
+
+        self.write_jpeg(self.image)
+
+    def canvas_size(self):
+        width = round((self.width_cm + 2 * self.wrap_cm + 2 * self.white_cm) * self.dpi / self.CM_TO_INCH)
+        height = round((self.height_cm + 2 * self.wrap_cm + 2 * self.white_cm) * self.dpi / self.CM_TO_INCH)
+        return width, height
+
+    def oversized(self):
+        """True if the print is large enough to be rendered band by band (see `stream_image()`)."""
+        width, height = self.canvas_size()
+        threshold = data.photo_processing_streaming_mpx
+        return bool(threshold) and width * height >= threshold * 1_000_000
+
+    @timed_stage
+    def stream_image(self):
+        """Renders and saves the image in horizontal bands of `data.photo_processing_band_px` rows.
+
+        The picture and the thin wrap strips are resampled straight from the source crop box, so the
+        resized picture and the full canvas are never held in memory. Finished bands go into a file-backed
+        buffer that the JPEG encoder reads directly, which bounds peak memory by the band height.
+        The wrap tiles are built by `data.photo_processing_wrap_engine` with the same filters as `stretch()`.
+        The band steps are timed under the names of the matching stages of `render()` and `save_image()`,
+        `stream_image` itself only keeps the remaining time.
+        """
+        image_width, image_height = self.cm_to_px(self.width_cm), self.cm_to_px(self.height_cm)
+        wrap_px = self.cm_to_px(self.wrap_cm)
+        white_left, white_top, white_right, white_bottom = self.white_margins(image_width + 2 * wrap_px,
+                                                                              image_height + 2 * wrap_px)
+        canvas_width = image_width + 2 * wrap_px + white_left + white_right
+        canvas_height = image_height + 2 * wrap_px + white_top + white_bottom
+        picture_x, picture_y = white_left + wrap_px, white_top + wrap_px
+
+        left, top, right, bottom = self.coordinates
+        scale_x = (right - left) / image_width
+        scale_y = (bottom - top) / image_height
+
+        def region(box):
+            x0, y0, x1, y1 = box
+            return self.resample((x1 - x0, y1 - y0),
+                                 (left + x0 * scale_x, top + y0 * scale_y, left + x1 * scale_x, top + y1 * scale_y))
+
+        tiles = {}
+        with stage_timer(self, 'stretch'):
+            if wrap_px > 0 and data.photo_processing_wrap_engine == 'numpy':
+                tiles = wrap_tiles(region, image_width, image_height, wrap_px,
+                                   self.strip_px, self.blur_px)
+            elif wrap_px > 0:
+                tiles = self.wrap_tiles_pillow(region, image_width, image_height)
+
+        with stage_timer(self, 'add_number'):
+            stamp = number_stamp(self.number, self.font_path, self.text_px, self.dpi) if self.number else None
+            numbers = self.number_positions(canvas_width, canvas_height, stamp) if stamp else []
+        text_color = data.photo_processing_font_color
+        icc = output_profile(self.material)
+
+        band_px = data.photo_processing_band_px
+
+        with tempfile.TemporaryFile() as buffer_file:
+            buffer = np.memmap(buffer_file, dtype=np.uint8, mode='w+', shape=(canvas_height, canvas_width, 4))
+
+            for band_top in range(0, canvas_height, band_px):
+                band_bottom = min(band_top + band_px, canvas_height)
+                with stage_timer(self, 'white_frame'):
+                    band = Image.new("RGB", (canvas_width, band_bottom - band_top), color="white")
+
+                rows = (max(band_top, picture_y) - picture_y, min(band_bottom, picture_y + image_height) - picture_y)
+                if rows[0] < rows[1]:
+                    with stage_timer(self, 'crop_resize'):
+                        picture = region((0, rows[0], image_width, rows[1]))
+                    band.paste(picture, (picture_x, picture_y + rows[0] - band_top))
+
+                with stage_timer(self, 'stretch'):
+                    for (x, y), tile in tiles.items():
+                        y += white_top - band_top
+                        if y < band.height and y + tile.height > 0:
+                            band.paste(tile, (white_left + x, y))
+
+                with stage_timer(self, 'black_frame'):
+                    ImageDraw.Draw(band).rectangle(
+                        [(0, -band_top), (canvas_width - 1, canvas_height - 1 - band_top)],
+                        outline="black",
+                        width=self.black_px)
+
+                with stage_timer(self, 'add_number'):
+                    for x, y in numbers:
+                        stamp.paste(band, (x, y - band_top), text_color)
+
+                with stage_timer(self, 'save_image'):
+                    if icc:
+                        convert_to_profile(band, self.icc, icc)
+                    buffer[band_top:band_bottom, :, :3] = np.asarray(band)
+
+            if icc:
+                self.icc = icc
+
+            with stage_timer(self, 'save_image'):
+                # RGBX is mapped by Pillow without a copy, the encoder reads rows straight from the file-backed buffer
+                image = Image.frombuffer("RGBX", (canvas_width, canvas_height), buffer, "raw", "RGBX", 0, 1)
+                self.write_jpeg(image)
+                del image, buffer
 
-        self.image.save(self.filepath, "JPEG", quality=100, dpi=(self.dpi, self.dpi), icc_profile=self.icc)
-        logger.info(f"File saved: {self.filepath}")
+        self.image = None
 
-    def process_image(self) -> Path:
-        if self.image:
-            self.image = self.image.crop(self.coordinates)
-            self.image = self.image.resize((self.cm_to_px(self.width_cm), self.cm_to_px(self.height_cm)))
+    @timed_stage
+    def crop_resize(self):
+        """Resamples the crop box straight from the source, without materializing the cropped copy first."""
+        self.image = self.resample((self.cm_to_px(self.width_cm), self.cm_to_px(self.height_cm)), self.coordinates)
+        self.orientation = 1
 
+    def render(self):
+        self.crop_resize()
+        if data.photo_processing_single_canvas:
+            self.compose()
+        else:
             self.stretch()
             self.white_frame()
-            self.black_frame()
-            self.add_number()
+        self.black_frame()
+        self.add_number()
+
+    def process_image(self) -> Path:
+        if self.image and self.oversized():
+            self.stream_image()
+        elif self.image:
+            self.render()
             self.save_image()
 
         return Path(self.filepath)
 
-    def get_result_image(self) -> Image.Image:
-        if self.image:
-            self.image = self.image.crop(self.coordinates)
-            self.image = self.image.resize((self.cm_to_px(self.width_cm), self.cm_to_px(self.height_cm)))
+    @staticmethod
+    def process_many(jobs):
+        """Batch entry point: renders `RenderJob`s in worker processes and yields `(job, filepath)` as they finish."""
+        from photo_processing.render_executor import render_executor
+        yield from render_executor.process_many(jobs)
 
-            self.stretch()
-            self.white_frame()
-            self.black_frame()
-            self.add_number()
+    def get_result_image(self, max_side=None) -> Image.Image:
+        """Renders the result without saving it. With `max_side`, renders a draft preview (see `draft()`)."""
+        if self.image:
+            if max_side:
+                self.draft(max_side)
+            self.render()
 
         return self.image
@@ -0,0 +1,169 @@
+"""Render Executor
+
+Runs `PhotoProc` jobs in a pool of worker processes, so rendering and JPEG encoding
+never block the bot's event loop and several photos can be rendered on all cores at once.
+
+Main parts:
+------------
+- RenderJob: serializable description of one render (image, size, number, material, crop box)
+  together with a snapshot of the processing settings from `data`.
+- RenderExecutor: lazily starts a `ProcessPoolExecutor` and awaits jobs on it.
+  - render(): renders one job.
+  - process_many(): renders a batch on all workers and yields the results as they finish.
+- render_executor: process-wide instance used by the bot and the tray.
+
+Usage:
+    from photo_processing import RenderJob, render_executor
+
+    filepath = await render_executor.render(RenderJob(image=image, width_cm=30, height_cm=40))
+
+    for job, filepath in render_executor.process_many(jobs):
+        ...
+
+Notes:
+- The pool size is `data.photo_processing_workers` (0 means one worker per CPU core).
+- Workers are spawned on every platform, as on Windows: a forked worker would inherit the bot's event loop,
+  threads and locks.
+- Worker processes load `data` from disk, so every job carries the current settings snapshot
+  and the worker applies it before rendering (only when it differs from the last applied one).
+- `RenderJob.image` may be a path instead of an image: the worker opens the file itself, so big
+  batches do not pickle decoded pixels through the pool.
+- `RenderJob.image` may also be a `SharedImage`: the worker reads the pixels from shared memory,
+  only the handle is pickled. The caller frees the block after the render.
+- Workers are started with `init_worker()`, which warms the font and ICC caches once per process;
+  they stay warm for every following job of the batch.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field, asdict
+from pathlib import Path
+
+from PIL import Image
+
+from data import data
+from photo_processing.photo_processing import PhotoProc
+from photo_processing.icc_profiles import default_profile, output_profile
+from photo_processing.text_cache import load_font
+from photo_processing.stage_stats import JobRecord, stage_stats
+from photo_processing.decoders import decode
+from photo_processing.shared_image import SharedImage
+
+logger = logging.getLogger(__name__)
+
+
+_applied_settings: dict = {}
+
+
+@dataclass
+class RenderJob:
+    image: Image.Image | SharedImage | str | Path
+    number: str = ''
+    width_cm: int = 0
+    height_cm: int = 0
+    material: str = 'Холст'
+    coordinates: tuple[int, int, int, int] | None = None
+    orientation: int = 1
+    settings: dict = field(default_factory=lambda: asdict(data))
+
+
+def apply_settings(settings: dict) -> None:
+    global _applied_settings
+    if settings == _applied_settings:
+        return
+
+    for name, value in settings.items():
+        setattr(data, name, value)
+    _applied_settings = settings
+
+
+def init_worker(settings: dict) -> None:
+    """Pool initializer: applies the settings and loads the fonts and ICC profiles before the first job."""
+    apply_settings(settings)
+    default_profile()
+    for material in data.photo_processing_material_icc:
+        output_profile(material)
+    load_font(data.photo_processing_font_path, (data.photo_processing_font_size_px / 72) * data.photo_processing_dpi)
+
+
+def render_job(job: RenderJob) -> tuple[Path, JobRecord]:
+    """Renders and saves one job. Runs inside a worker process and returns the path with the stage timings."""
+    apply_settings(job.settings)
+
+    image = job.image
+    if isinstance(image, (str, Path)):
+        image = decode(image)
+    elif isinstance(image, SharedImage):
+        image = image.open()
+
+    processing = PhotoProc()
+    processing.presets(
+        image=image,
+        number=job.number,
+        width_cm=job.width_cm,
+        height_cm=job.height_cm,
+        material=job.material,
+        coordinates=job.coordinates,
+        orientation=job.orientation
+    )
+    filepath = processing.process_image()
+    return filepath, JobRecord(processing.timings, processing.dimensions)
+
+
+class RenderExecutor:
+    def __init__(self):
+        self._pool: ProcessPoolExecutor | None = None
+
+    def pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            workers = data.photo_processing_workers or os.cpu_count()
+            self._pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                             initializer=init_worker, initargs=(asdict(data),))
+            logger.info(f'Render pool started with {workers} workers')
+        return self._pool
+
+    async def render(self, job: RenderJob, record: JobRecord | None = None) -> Path:
+        """Renders `job` in a worker process and returns the path of the saved file.
+        The render stages are added to `record`, or to `stage_stats` as a job of their own if it is not given."""
+        loop = asyncio.get_running_loop()
+        try:
+            filepath, worker_record = await loop.run_in_executor(self.pool(), render_job, job)
+        except BrokenProcessPool:
+            logger.exception('Render worker died, restarting the pool')
+            self.shutdown()
+            raise
+
+        if record is None:
+            stage_stats.add(worker_record)
+        else:
+            record.merge(worker_record)
+        return filepath
+
+    def process_many(self, jobs: Iterable[RenderJob]) -> Iterator[tuple[RenderJob, Path | None]]:
+        """Renders all `jobs` on the pool at once and yields `(job, filepath)` in completion order.
+        A failed job is logged and yielded with `None`, the rest of the batch goes on."""
+        futures = {self.pool().submit(render_job, job): job for job in jobs}
+        for future in as_completed(futures):
+            try:
+                filepath, record = future.result()
+                stage_stats.add(record)
+            except BrokenProcessPool:
+                self.shutdown()
+                raise
+            except Exception:
+                logger.exception('Render job failed')
+                filepath = None
+            yield futures[future], filepath
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+render_executor = RenderExecutor()
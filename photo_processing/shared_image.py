@@ -0,0 +1,92 @@
+"""Shared Image
+
+Decoded images in shared memory, so the bot, the Cropper process and the render workers use one buffer
+instead of pickling the pixels through pipes.
+
+The bot copies a decoded photo into a shared memory block once and passes a small `SharedImage` handle
+(block name, size, mode and ICC profile) to the Cropper and to `RenderJob`. Any process can map the block by its name
+and read the pixels from it. Only the handle, the crop box and the orientation cross process boundaries.
+
+Main parts:
+------------
+- SharedImage: picklable handle of an image in shared memory.
+  - create(): copies an image into a new block owned by the current process.
+  - open(): maps the block and reads it into a Pillow image.
+  - unlink(): frees the block, called by the owner once nobody needs it.
+
+Usage:
+    from photo_processing.shared_image import SharedImage
+
+    shared = SharedImage.create(image)
+    filepath = await render_executor.render(RenderJob(image=shared, width_cm=30, height_cm=40))
+    shared.unlink()
+
+Notes:
+- Only 8-bit modes ('RGB', 'L', 'RGBA'), which is what `decode()` returns.
+- The owner keeps the block open until `unlink()`: on Windows a block disappears once no process has it open.
+"""
+
+import logging
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+BAND_ROWS = 256  # Rows copied at once by create(), keeps the temporary bytes small
+
+_owned: dict[str, shared_memory.SharedMemory] = {}  # Blocks created by this process, until unlink()
+
+
+@dataclass(frozen=True)
+class SharedImage:
+    name: str
+    size: tuple[int, int]
+    mode: str = 'RGB'
+    icc_profile: bytes | None = None  # Travels with the handle, `PhotoProc` converts colours with it
+
+    @property
+    def stride(self) -> int:
+        return self.size[0] * Image.getmodebands(self.mode)
+
+    @property
+    def nbytes(self) -> int:
+        return self.stride * self.size[1]
+
+    @classmethod
+    def create(cls, image: Image.Image) -> 'SharedImage':
+        """Copies `image` into a new shared memory block, band by band."""
+        block = shared_memory.SharedMemory(create=True, size=max(1, image.width * image.height * len(image.getbands())))
+        shared = cls(block.name, image.size, image.mode, image.info.get('icc_profile'))
+
+        for top in range(0, image.height, BAND_ROWS):
+            band = image.crop((0, top, image.width, min(image.height, top + BAND_ROWS))).tobytes()
+            offset = top * shared.stride
+            block.buf[offset:offset + len(band)] = band
+
+        _owned[block.name] = block
+        logger.debug(f'Shared image {block.name}: {image.size} {image.mode}, {shared.nbytes / 2 ** 20:.0f} MB')
+        return shared
+
+    def open(self) -> Image.Image:
+        """Reads the shared pixels into a new Pillow image, the block itself is not changed."""
+        block = _owned.get(self.name) or shared_memory.SharedMemory(name=self.name)
+        try:
+            image = Image.frombuffer(self.mode, self.size, block.buf, 'raw', self.mode, 0, 1)
+            if image.readonly:  # Modes Pillow maps in place still point at the block
+                mapped, image = image, image.copy()
+                del mapped
+            if self.icc_profile:
+                image.info['icc_profile'] = self.icc_profile
+            return image
+        finally:
+            if self.name not in _owned:
+                block.close()
+
+    def unlink(self) -> None:
+        block = _owned.pop(self.name, None)
+        if block is None:
+            return
+        block.close()
+        block.unlink()
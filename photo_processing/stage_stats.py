@@ -0,0 +1,127 @@
+"""Stage Stats
+
+Per-stage timings of processed photos, kept in memory for the `/stats` bot command.
+
+A `JobRecord` collects the duration of every stage of one job: the bot stages (download, cropper wait,
+sending the result) are recorded by `process_image_add_to_queue()`, the render stages by `PhotoProc`
+inside the worker process. Finished records go into a ring buffer of the last
+`data.photo_processing_stats_jobs` jobs, from which percentiles per stage are computed.
+
+Main parts:
+------------
+- timed_stage: decorator for `PhotoProc` methods, records their exclusive time and the image size after them.
+- stage_timer(): the same timing for a block inside a stage, used for the band steps of `PhotoProc.stream_image()`.
+- JobRecord: timings and image dimensions of one job.
+- StageStats: ring buffer of finished jobs with p50/p95 per stage.
+- stage_stats: process-wide instance.
+
+Usage:
+    from photo_processing import JobRecord, stage_stats
+
+    record = JobRecord()
+    with record.stage('download'):
+        ...
+    stage_stats.add(record)
+    stage_stats.summary()  # {'download': StageSummary(count=1, p50=0.8, p95=0.8), ...}
+"""
+
+import functools
+import logging
+import math
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+from data import data
+
+logger = logging.getLogger(__name__)
+
+
+@contextmanager
+def stage_timer(processing, stage):
+    """Adds the time of the block to `processing.timings[stage]` (without nested stages).
+    The time is not counted again in the enclosing stage."""
+    processing._stage_children.append(0.0)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        children = processing._stage_children.pop()
+        processing._stage_children[-1] += elapsed
+        processing.timings[stage] = processing.timings.get(stage, 0.0) + elapsed - children
+
+
+def timed_stage(method):
+    """Records the time of a `PhotoProc` stage into `self.timings` (without nested stages)
+    and the image size after it into `self.dimensions`."""
+    stage = method.__name__
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        try:
+            with stage_timer(self, stage):
+                return method(self, *args, **kwargs)
+        finally:
+            if self.image is not None:
+                self.dimensions[stage] = self.image.size
+
+    return wrapper
+
+
+@dataclass
+class JobRecord:
+    timings: dict[str, float] = field(default_factory=dict)
+    dimensions: dict[str, tuple[int, int]] = field(default_factory=dict)
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0.0) + time.perf_counter() - start
+
+    def merge(self, other: 'JobRecord') -> None:
+        for name, seconds in other.timings.items():
+            self.timings[name] = self.timings.get(name, 0.0) + seconds
+        self.dimensions.update(other.dimensions)
+
+
+@dataclass(frozen=True)
+class StageSummary:
+    count: int
+    p50: float
+    p95: float
+
+
+def percentile(values: list[float], q: float) -> float:
+    """Nearest-rank percentile of sorted `values`."""
+    return values[max(0, math.ceil(q * len(values)) - 1)]
+
+
+class StageStats:
+    def __init__(self, size: int):
+        self.records: deque[JobRecord] = deque(maxlen=size)
+
+    def add(self, record: JobRecord) -> None:
+        if self.records.maxlen != data.photo_processing_stats_jobs:
+            self.records = deque(self.records, maxlen=data.photo_processing_stats_jobs)
+        self.records.append(record)
+        logger.debug(f'Job stages: {record.timings}, dimensions: {record.dimensions}')
+
+    def summary(self) -> dict[str, StageSummary]:
+        stages: dict[str, list[float]] = {}
+        for record in self.records:
+            for name, seconds in record.timings.items():
+                stages.setdefault(name, []).append(seconds)
+
+        summary = {}
+        for name, values in stages.items():
+            values.sort()
+            summary[name] = StageSummary(count=len(values), p50=percentile(values, 0.5), p95=percentile(values, 0.95))
+        return summary
+
+
+stage_stats = StageStats(data.photo_processing_stats_jobs)
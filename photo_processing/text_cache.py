@@ -0,0 +1,81 @@
+"""Text Cache
+
+Process-wide caches used by `PhotoProc.add_number()`.
+
+Loading a TrueType font, measuring the text and rasterizing it twice (stroke and fill)
+costs far more than the final paste, and the same number is usually printed on several
+photos of one order. Fonts are cached by (path, size) and rendered numbers by
+(text, font, size, dpi), both with bounded LRU eviction.
+
+Main parts:
+------------
+- load_font(): returns a cached `FreeTypeFont` (or Pillow's default font if the file cannot be loaded).
+- number_stamp(): returns a cached `NumberStamp` with the stroke and fill masks of a number.
+- clear_text_cache(): drops both caches; called when font settings change.
+
+Notes:
+- Masks do not depend on the text color, so the color is applied at paste time and is not part of the key.
+"""
+
+import logging
+from dataclasses import dataclass
+from functools import lru_cache
+
+from PIL import Image, ImageDraw, ImageFont
+
+logger = logging.getLogger(__name__)
+
+STROKE_WIDTH = 5
+
+
+@dataclass(frozen=True)
+class NumberStamp:
+    stroke: Image.Image  # L mask of the stroked text
+    fill: Image.Image  # L mask of the text itself
+    offset: tuple[int, int]  # mask position relative to the text origin
+    width: int  # text width without stroke, used for layout
+    height: int  # text height without stroke, used for layout
+
+    def paste(self, canvas: Image.Image, xy: tuple[int, int], color, stroke_color="white") -> None:
+        """Draws the number onto `canvas` exactly like `ImageDraw.text(..., stroke_width=STROKE_WIDTH)`."""
+        position = (xy[0] + self.offset[0], xy[1] + self.offset[1])
+        canvas.paste(stroke_color, position + (position[0] + self.stroke.width, position[1] + self.stroke.height),
+                     self.stroke)
+        canvas.paste(color, position + (position[0] + self.fill.width, position[1] + self.fill.height), self.fill)
+
+
+@lru_cache(maxsize=8)
+def load_font(path: str, size: float) -> ImageFont.FreeTypeFont | ImageFont.ImageFont:
+    try:
+        return ImageFont.truetype(path, size)
+    except Exception:
+        logger.exception('Font not found')
+        return ImageFont.load_default()
+
+
+@lru_cache(maxsize=64)
+def number_stamp(text: str, font_path: str, text_px: int, dpi: int) -> NumberStamp:
+    font = load_font(font_path, (text_px / 72) * dpi)
+
+    draw = ImageDraw.Draw(Image.new("L", (1, 1)))
+    text_bbox = draw.textbbox((0, 0), text, font=font)
+    left, top, right, bottom = draw.textbbox((0, 0), text, font=font, stroke_width=STROKE_WIDTH)
+    size = (right - left, bottom - top)
+
+    stroke = Image.new("L", size)
+    ImageDraw.Draw(stroke).text((-left, -top), text, font=font, fill=255, stroke_width=STROKE_WIDTH, stroke_fill=255)
+    fill = Image.new("L", size)
+    ImageDraw.Draw(fill).text((-left, -top), text, font=font, fill=255)
+
+    return NumberStamp(
+        stroke=stroke,
+        fill=fill,
+        offset=(left, top),
+        width=text_bbox[2] - text_bbox[0],
+        height=text_bbox[3] - text_bbox[1]
+    )
+
+
+def clear_text_cache() -> None:
+    number_stamp.cache_clear()
+    load_font.cache_clear()
@@ -0,0 +1,176 @@
+"""Wrap Engine
+
+Array-backed implementation of the gallery-wrap stretch used by `PhotoProc.stretch()`.
+
+Instead of cropping, resizing, blurring, flipping and pasting eight separate Pillow images,
+only the thin edge strips and corner squares are read into NumPy, stretched and blurred
+with a few vectorized matrix operations and written into the single output canvas. The visual result matches the Pillow path: edge strips are stretched
+to the wrap width, blurred and mirrored; corners are stretched from an inner square and blurred.
+
+Main parts:
+------------
+- wrap_tiles(): builds the four edge and four corner tiles of the wrap from thin regions of an image.
+- stretch_array(): returns a new image with the wrap added around the source image.
+
+Notes:
+- Resampling is linear and Gaussian blur is approximated with three box blurs,
+  the same approximation Pillow uses for `ImageFilter.GaussianBlur`.
+"""
+
+import math
+
+import numpy as np
+from PIL import Image
+
+
+def _resample_axis(array: np.ndarray, length: int, axis: int) -> np.ndarray:
+    """Linearly resamples `array` along `axis` to `length` samples."""
+    size = array.shape[axis]
+    positions = (np.arange(length, dtype=np.float32) + 0.5) * (size / length) - 0.5
+    positions = np.clip(positions, 0, size - 1)
+    lower = np.floor(positions).astype(np.intp)
+    upper = np.minimum(lower + 1, size - 1)
+
+    shape = [1] * array.ndim
+    shape[axis] = length
+    weight = (positions - lower).reshape(shape)
+
+    low = np.take(array, lower, axis=axis).astype(np.float32)
+    high = np.take(array, upper, axis=axis).astype(np.float32)
+    return low + (high - low) * weight
+
+
+def _box_blur_axis(array: np.ndarray, radius: int, axis: int) -> np.ndarray:
+    """Box blur along `axis` with edge extension, computed from a cumulative sum."""
+    if radius < 1 or array.shape[axis] == 0:
+        return array
+
+    moved = np.moveaxis(array, axis, 0)
+    padded = np.concatenate((np.repeat(moved[:1], radius + 1, axis=0),
+                             moved,
+                             np.repeat(moved[-1:], radius, axis=0)))
+    csum = np.cumsum(padded, axis=0, dtype=np.float32)
+    length = moved.shape[0]
+    blurred = (csum[2 * radius + 1:2 * radius + 1 + length] - csum[:length]) / (2 * radius + 1)
+    return np.moveaxis(blurred, 0, axis)
+
+
+def _gaussian_blur(array: np.ndarray, sigma: float, axes=(0, 1)) -> np.ndarray:
+    """Approximates a Gaussian blur with three box blur passes on each of `axes`."""
+    if sigma <= 0:
+        return array
+
+    radius = round((math.sqrt(4 * sigma * sigma + 1) - 1) / 2)
+    for axis in axes:
+        for _ in range(3):
+            array = _box_blur_axis(array, radius, axis)
+    return array
+
+
+def _stretch_matrix(source_length: int, target_length: int, sigma: float) -> np.ndarray:
+    """Linear operator (target x source) that stretches a line and blurs the result.
+
+    Resampling and blurring are both linear, so along the short axis of a strip they are folded
+    into one small matrix and applied with a single matmul.
+    """
+    resample = _resample_axis(np.eye(source_length, dtype=np.float32), target_length, 0)
+    blur = _gaussian_blur(np.eye(target_length, dtype=np.float32), sigma, axes=(0,))
+    return blur @ resample
+
+
+def _to_uint8(array: np.ndarray) -> np.ndarray:
+    return np.clip(array + 0.5, 0, 255).astype(np.uint8)
+
+
+def wrap_tiles(region, width: int, height: int, wrap_px: int, strip_px: int, blur_px: float) -> dict:
+    """Builds the eight wrap tiles (four edges and four corners) of an image of `width` x `height`.
+
+        Args:
+            region (Callable[[tuple[int, int, int, int]], Image.Image]): Returns the pixels of a box of the image.
+                Only thin edge strips and corner squares are requested.
+            width (int): Image width in pixels.
+            height (int): Image height in pixels.
+            wrap_px (int): Wrap width in pixels.
+            strip_px (int): Length of the edge strip (and corner square) taken from the image.
+            blur_px (float): Gaussian blur radius applied to the wrap.
+
+        Returns:
+            dict[tuple[int, int], Image.Image]: Tiles by their position relative to the top-left corner
+                of the wrapped image.
+    """
+    strip = min(strip_px, width, height)
+    corner = min(strip_px, width // 3, height // 3)
+
+    # Rows are reversed so the wrap mirrors the picture over the stretcher bar
+    edge_matrix = _stretch_matrix(strip, wrap_px, blur_px)[::-1]
+    corner_matrix = _stretch_matrix(corner, wrap_px, blur_px)
+
+    def pixels(box):
+        return np.asarray(region(box).convert("RGB"), dtype=np.float32)
+
+    def vertical_edge(box):
+        # Blur along the long axis first, while the strip is still `strip` pixels wide,
+        # then stretch and blur across it with one (height * 3, strip) x (strip, wrap) matmul
+        edge = _gaussian_blur(pixels(box), blur_px, axes=(0,))
+        edge = edge.transpose(0, 2, 1).reshape(-1, strip) @ edge_matrix.T
+        return _to_uint8(edge.reshape(height, 3, wrap_px).transpose(0, 2, 1))
+
+    def horizontal_edge(box):
+        edge = _gaussian_blur(pixels(box), blur_px, axes=(1,))
+        edge = edge_matrix @ edge.reshape(strip, -1)
+        return _to_uint8(edge.reshape(wrap_px, width, 3))
+
+    def corner_square(left, top):
+        square = pixels((left, top, left + corner, top + corner))
+        return _to_uint8(np.matmul(corner_matrix, np.tensordot(corner_matrix, square, axes=1)))
+
+    tiles = {
+        (0, wrap_px): vertical_edge((0, 0, strip, height)),
+        (width + wrap_px, wrap_px): vertical_edge((width - strip, 0, width, height)),
+        (wrap_px, 0): horizontal_edge((0, 0, width, strip)),
+        (wrap_px, height + wrap_px): horizontal_edge((0, height - strip, width, height)),
+
+        (0, 0): corner_square(corner, corner),
+        (width + wrap_px, 0): corner_square(width - corner * 2, corner),
+        (0, height + wrap_px): corner_square(corner, height - corner * 2),
+        (width + wrap_px, height + wrap_px): corner_square(width - corner * 2, height - corner * 2),
+    }
+    return {position: Image.fromarray(tile, "RGB") for position, tile in tiles.items()}
+
+
+def stretch_array(
+        image: Image.Image,
+        wrap_px: int,
+        strip_px: int,
+        blur_px: float,
+        canvas: Image.Image | None = None,
+        offset: tuple[int, int] = (0, 0)
+) -> Image.Image:
+    """Adds a stretched, blurred and mirrored wrap of `wrap_px` around `image`.
+
+        Args:
+            image (Image.Image): RGB image at final print size (without wrap).
+            wrap_px (int): Wrap width in pixels.
+            strip_px (int): Length of the edge strip (and corner square) taken from the image.
+            blur_px (float): Gaussian blur radius applied to the wrap.
+            canvas (Image.Image | None): Existing RGB canvas to draw into instead of allocating a new one.
+            offset (tuple[int, int]): Top-left position of the wrapped image on `canvas`.
+
+        Returns:
+            Image.Image: RGB image `2 * wrap_px` larger in both dimensions, or `canvas` if it was given.
+    """
+    if wrap_px <= 0 and canvas is None:
+        return image
+
+    width, height = image.size
+    if canvas is None:
+        canvas = Image.new("RGB", (width + 2 * wrap_px, height + 2 * wrap_px))
+    x, y = offset
+    canvas.paste(image, (x + wrap_px, y + wrap_px))
+    if wrap_px <= 0:
+        return canvas
+
+    for position, tile in wrap_tiles(image.crop, width, height, wrap_px, strip_px, blur_px).items():
+        canvas.paste(tile, (x + position[0], y + position[1]))
+
+    return canvas
@@ -0,0 +1,33 @@
+from io import BytesIO
+
+import pytest
+from PIL import Image, UnidentifiedImageError
+
+from photo_processing.decoders import decode
+
+
+def jpeg_bytes(size=(4000, 3000)):
+    buffer = BytesIO()
+    Image.linear_gradient('L').convert('RGB').resize(size).save(buffer, 'JPEG')
+    return buffer.getvalue()
+
+
+def test1_decode():
+    image = decode(jpeg_bytes())
+    assert image.size == (4000, 3000)
+    assert image.mode == 'RGB'
+
+
+def test2_decode_max_side():
+    image = decode(jpeg_bytes(), max_side=800)
+    assert max(image.size) == 800
+    assert image.size == (800, 600)
+
+
+def test3_decode_broken():
+    with pytest.raises(UnidentifiedImageError):
+        decode(b'not an image')
+
+
+if __name__ == '__main__':
+    pytest.main()
@@ -0,0 +1,60 @@
+import errno
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from photo_processing.file_names import NameAllocator, move_exclusive
+
+
+def publish(allocator, directory, filename):
+    fd, temp_path = tempfile.mkstemp(suffix='.tmp', dir=directory)
+    os.close(fd)
+    return allocator.publish(temp_path, str(directory), filename)
+
+
+def test1_publish(tmp_path):
+    (tmp_path / '20х30 Холст.jpg').touch()
+    (tmp_path / '20х30 Холст (4).jpg').touch()
+    allocator = NameAllocator()
+
+    assert publish(allocator, tmp_path, '30х40 Холст.jpg') == str(tmp_path / '30х40 Холст.jpg')
+    assert publish(allocator, tmp_path, '30х40 Холст.jpg') == str(tmp_path / '30х40 Холст (2).jpg')
+    assert publish(allocator, tmp_path, '20х30 Холст.jpg') == str(tmp_path / '20х30 Холст (5).jpg')
+
+    # Created behind the allocator's back
+    (tmp_path / '20х30 Холст (6).jpg').touch()
+    assert publish(allocator, tmp_path, '20х30 Холст.jpg') == str(tmp_path / '20х30 Холст (7).jpg')
+
+
+def test2_publish_concurrent(tmp_path):
+    allocators = [NameAllocator() for _ in range(4)]  # Separate indexes, like worker processes
+    with ThreadPoolExecutor(8) as pool:
+        paths = list(pool.map(lambda i: publish(allocators[i % 4], tmp_path, '40х60 Баннер.jpg'), range(40)))
+
+    assert len(set(paths)) == 40
+    assert not list(tmp_path.glob('*.tmp'))
+
+
+@pytest.mark.skipif(os.name == 'nt', reason='hard links are only used on POSIX')
+def test3_move_without_hard_links(tmp_path, monkeypatch):
+    def no_link(source, target):
+        raise OSError(errno.EPERM, 'Operation not permitted')
+
+    monkeypatch.setattr(os, 'link', no_link)
+    source = tmp_path / 'photo.tmp'
+    source.write_bytes(b'photo')
+    (tmp_path / 'taken.jpg').write_bytes(b'other')
+
+    with pytest.raises(FileExistsError):
+        move_exclusive(str(source), str(tmp_path / 'taken.jpg'))
+    assert (tmp_path / 'taken.jpg').read_bytes() == b'other'
+
+    move_exclusive(str(source), str(tmp_path / 'free.jpg'))
+    assert (tmp_path / 'free.jpg').read_bytes() == b'photo'
+    assert not source.exists()
+
+
+if __name__ == '__main__':
+    pytest.main()
@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+from photo_processing import PhotoProc
+from photo_processing.orientation import TRANSPOSE, rotation_orientation, source_box, upright_size
+
+
+@pytest.mark.parametrize('orientation', range(1, 9))
+def test1_source_box(orientation):
+    pixels = np.random.default_rng(orientation).integers(0, 255, (40, 60, 3), dtype=np.uint8)
+    stored = Image.fromarray(pixels)
+    upright = stored.transpose(TRANSPOSE[orientation]) if orientation in TRANSPOSE else stored
+    box = (5, 7, 23, 31)
+
+    region = stored.crop(source_box(box, stored.size, orientation))
+    if orientation in TRANSPOSE:
+        region = region.transpose(TRANSPOSE[orientation])
+
+    assert upright.size == upright_size(stored.size, orientation)
+    assert region.tobytes() == upright.crop(box).tobytes()
+
+
+@pytest.mark.parametrize('angle', [0, -90, -180, -270, 90, 180, 270])
+def test2_rotation_orientation(angle):
+    image = Image.fromarray(np.random.default_rng(0).integers(0, 255, (40, 60, 3), dtype=np.uint8))
+    orientation = rotation_orientation(angle)
+    turned = image.transpose(TRANSPOSE[orientation]) if orientation in TRANSPOSE else image
+
+    assert turned.tobytes() == image.rotate(angle, expand=True).tobytes()
+
+
+@pytest.mark.parametrize('angle', [0, -90, -180, -270])
+def test3_crop_first_rotation(angle):
+    image = Image.fromarray(np.random.default_rng(1).integers(0, 255, (40, 60, 3), dtype=np.uint8))
+    box = (3, 5, 27, 35)
+    processing = PhotoProc()
+    processing.presets(image=image, coordinates=box, orientation=rotation_orientation(angle))
+
+    expected = image.rotate(angle, expand=True).crop(box)
+    assert processing.resample(expected.size, box).tobytes() == expected.tobytes()
+
+
+@pytest.mark.parametrize('angle', [0, -90, -180, -270])
+def test4_box_outside_source(angle):
+    image = Image.fromarray(np.random.default_rng(2).integers(1, 255, (40, 60, 3), dtype=np.uint8))
+    box = (-10, -5, 50, 65)  # The Cropper frame is larger than the photo
+    processing = PhotoProc()
+    processing.presets(image=image, coordinates=box, orientation=rotation_orientation(angle))
+
+    expected = image.rotate(angle, expand=True).crop(box)
+    assert processing.resample(expected.size, box).tobytes() == expected.tobytes()
+
+
+def test5_crop_resize_outside_source():
+    image = Image.fromarray(np.full((128, 96, 3), 200, dtype=np.uint8))
+    processing = PhotoProc()
+    processing.presets(image=image, width_cm=6, height_cm=9, coordinates=(-24, -52, 120, 180))
+    processing.crop_resize()
+
+    pixels = np.asarray(processing.image)
+    assert processing.image.size == (processing.cm_to_px(6), processing.cm_to_px(9))
+    assert pixels[0, 0].tolist() == [0, 0, 0]  # Padded as by `Image.crop()`
+    assert pixels[pixels.shape[0] // 2, pixels.shape[1] // 2].tolist() == [200, 200, 200]
+
+
+@pytest.mark.parametrize('angle', [0, -90])
+def test6_draft_outside_source(angle):
+    image = Image.fromarray(np.full((1280, 960, 3), 200, dtype=np.uint8))
+    box = (-240, -520, 1200, 1800) if angle == 0 else (-520, -240, 1800, 1200)
+    processing = PhotoProc()
+    processing.presets(image=image, width_cm=60, height_cm=90, coordinates=box,
+                       orientation=rotation_orientation(angle))
+    processing.draft(400)
+
+    pixels = np.asarray(processing.image)
+    assert processing.coordinates == (0, 0) + processing.image.size
+    assert pixels[0, 0].tolist() == [0, 0, 0]
+    assert pixels[pixels.shape[0] // 2, pixels.shape[1] // 2].tolist() == [200, 200, 200]
+    assert processing.get_result_image().size  # The preview renders from the padded proxy
+
+
+if __name__ == '__main__':
+    pytest.main()
@@ -0,0 +1,25 @@
+import pytest
+from PIL import Image
+
+from data import data
+from photo_processing import PhotoProc, RenderJob, render_executor
+
+
+def test1_process_many(tmp_path, monkeypatch):
+    monkeypatch.setattr(data, 'photo_processing_path', str(tmp_path))
+    monkeypatch.setattr(data, 'photo_processing_workers', 2)
+    image_path = tmp_path / 'source.png'
+    Image.linear_gradient('L').convert('RGB').resize((300, 400)).save(image_path)
+
+    jobs = [RenderJob(image=image_path, number=str(number), width_cm=10, height_cm=15) for number in range(4)]
+    results = list(PhotoProc.process_many(jobs))
+    render_executor.shutdown()
+
+    assert sorted(job.number for job, _ in results) == ['0', '1', '2', '3']
+    for job, filepath in results:
+        assert filepath.exists()
+        assert job.number in filepath.name
+
+
+if __name__ == '__main__':
+    pytest.main()
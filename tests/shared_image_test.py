@@ -0,0 +1,47 @@
+import pytest
+from PIL import Image, ImageCms
+
+from data import data
+from photo_processing import PhotoProc, RenderJob, SharedImage, render_executor
+
+
+@pytest.mark.parametrize('mode', ['RGB', 'L', 'RGBA'])
+def test1_round_trip(mode):
+    image = Image.radial_gradient('L').resize((300, 517)).convert(mode)
+    shared = SharedImage.create(image)
+    try:
+        assert shared.nbytes == len(image.tobytes())
+        assert shared.open().tobytes() == image.tobytes()
+    finally:
+        shared.unlink()
+    with pytest.raises(FileNotFoundError):
+        shared.open()
+
+
+def test2_render_in_worker(tmp_path, monkeypatch):
+    monkeypatch.setattr(data, 'photo_processing_path', str(tmp_path))
+    monkeypatch.setattr(data, 'photo_processing_workers', 1)
+    shared = SharedImage.create(Image.linear_gradient('L').convert('RGB').resize((300, 400)))
+    try:
+        results = list(PhotoProc.process_many([RenderJob(image=shared, number='1', width_cm=10, height_cm=15)]))
+    finally:
+        render_executor.shutdown()
+        shared.unlink()
+
+    [(job, filepath)] = results
+    assert filepath.exists()
+
+
+def test3_icc_profile():
+    icc_profile = ImageCms.ImageCmsProfile(ImageCms.createProfile('LAB')).tobytes()
+    image = Image.new('RGB', (20, 10))
+    image.info['icc_profile'] = icc_profile
+    shared = SharedImage.create(image)
+    try:
+        assert shared.open().info['icc_profile'] == icc_profile
+    finally:
+        shared.unlink()
+
+
+if __name__ == '__main__':
+    pytest.main()
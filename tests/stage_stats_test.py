@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+from data import data
+from photo_processing import PhotoProc
+from photo_processing.stage_stats import JobRecord, StageStats
+
+
+def test1_stage_stats():
+    stats = StageStats(100)
+    for seconds in range(1, 101):
+        stats.add(JobRecord(timings={'download': seconds / 100, 'render': seconds}))
+
+    summary = stats.summary()
+    assert summary['render'].count == 100
+    assert summary['render'].p50 == 50
+    assert summary['render'].p95 == 95
+    assert summary['download'].p95 == 0.95
+
+
+def test2_job_record_merge():
+    record = JobRecord(timings={'download': 1.0})
+    record.merge(JobRecord(timings={'download': 0.5, 'save_image': 2.0}, dimensions={'save_image': (10, 20)}))
+
+    assert record.timings == {'download': 1.5, 'save_image': 2.0}
+    assert record.dimensions == {'save_image': (10, 20)}
+
+
+def test3_streamed_stages(tmp_path, monkeypatch):
+    monkeypatch.setattr(data, 'photo_processing_path', str(tmp_path))
+    monkeypatch.setattr(data, 'photo_processing_streaming_mpx', 1)  # Every print is above 1 MP
+    processing = PhotoProc()
+    processing.presets(image=Image.fromarray(np.zeros((400, 300, 3), np.uint8)), width_cm=10, height_cm=15)
+    processing.process_image()
+
+    stages = {'crop_resize', 'stretch', 'white_frame', 'black_frame', 'save_image', 'stream_image'}
+    assert stages <= set(processing.timings)
+    assert processing.timings['stream_image'] < sum(processing.timings.values())
+
+
+if __name__ == '__main__':
+    pytest.main()
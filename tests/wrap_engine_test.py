@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+from data import data
+from photo_processing import PhotoProc
+
+
+def gradient_image(width=600, height=800):
+    y, x = np.mgrid[0:height, 0:width]
+    pixels = np.stack([x * 255 // width, y * 255 // height, (x + y) % 256], axis=-1)
+    return Image.fromarray(pixels.astype(np.uint8), 'RGB')
+
+
+def stretched(engine, image, monkeypatch):
+    monkeypatch.setattr(data, 'photo_processing_wrap_engine', engine)
+    processing = PhotoProc()
+    processing.image = image
+    processing.stretch()
+    return processing.image
+
+
+def rendered(streaming_mpx, coordinates, monkeypatch):
+    monkeypatch.setattr(data, 'photo_processing_streaming_mpx', streaming_mpx)
+    processing = PhotoProc()
+    processing.presets(image=gradient_image(), width_cm=10, height_cm=15, coordinates=coordinates)
+    with Image.open(processing.process_image()) as image:
+        return np.asarray(image.convert('RGB'), dtype=int)
+
+
+def test1_wrap_engine(monkeypatch):
+    image = gradient_image()
+    pillow = stretched('pillow', image, monkeypatch)
+    numpy = stretched('numpy', image, monkeypatch)
+
+    assert pillow.size == numpy.size
+    difference = np.abs(np.asarray(pillow, dtype=int) - np.asarray(numpy, dtype=int))
+    assert difference.mean() < 1
+    assert difference.max() < 32
+
+
+@pytest.mark.parametrize('coordinates', [None, (-60, -100, 660, 900)])  # The second frame is larger than the photo
+@pytest.mark.parametrize('engine', ['pillow', 'numpy'])
+def test2_streamed_wrap(engine, coordinates, tmp_path, monkeypatch):
+    monkeypatch.setattr(data, 'photo_processing_path', str(tmp_path))
+    monkeypatch.setattr(data, 'photo_processing_wrap_engine', engine)
+    whole = rendered(0, coordinates, monkeypatch)
+    streamed = rendered(1, coordinates, monkeypatch)  # Every print is above 1 MP
+
+    assert whole.shape == streamed.shape
+    difference = np.abs(whole - streamed)
+    assert difference.mean() < 0.05  # Bands and the whole canvas only differ by JPEG rounding
+    assert difference.max() < 16
+
+
+if __name__ == '__main__':
+    pytest.main()
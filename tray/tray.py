@@ -5,23 +5,23 @@ Provides a tray icon with menu items:
     • Stop - to stop Sendy app
 
 Note:
-    Uses pystray and runs actions in separate threads.
+    Uses pystray and runs actions in separate threads. The Cropper runs in `cropper_service`,
+    rendering in `render_executor`.
 """
 
 import asyncio
 import logging
 import os
-from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 import pystray
 import threading
 from PIL import Image
 
-from cropper.cropper_main import sendy_cropper
+from cropper.cropper_service import cropper_service
 from config import config
 from handlers import stop_sendy, send_result
-from photo_processing import PhotoProc
+from photo_processing import RenderJob, render_executor
 
 logger = logging.getLogger(__name__)
 icon_path = os.path.join(config.info.app_directory, "sendy.ico")
@@ -34,16 +34,12 @@ def run_cropper() -> None:
     )
 
 async def run_cropper_async():
-    """Start the Sendy Cropper application in a new thread."""
-    with ThreadPoolExecutor(max_workers=1) as executor:
-        future = executor.submit(sendy_cropper)
-        result = future.result()
+    """Opens an empty Sendy Cropper window in the Cropper process."""
+    result = await cropper_service.crop()
 
-    processing = PhotoProc()
     if result:
         number = result['number']
-        processing.presets(**result)
-        filepath: Path = processing.process_image()
+        filepath: Path = await render_executor.render(RenderJob(**result))
         await send_result(filepath, False, number)
 
 